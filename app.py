@@ -1,5 +1,5 @@
 import streamlit as st
-from floating_ai import render_floating_ai
+from floating_ai import render_floating_ai, start_ai_warm_up
 from utils.common import set_page_style
 
 # 1. 页面配置
@@ -12,6 +12,9 @@ st.set_page_config(
 # 2. 全局 CSS 优化
 set_page_style()
 
+# 后台预热 AI 助手（导入依赖、加载模型与索引），页面渲染不等待
+start_ai_warm_up()
+
 # 3. 页面内容
 st.title("深远海风电构网型控制监测平台")
 st.info("欢迎。本项目旨在研究深远海风电在弱网环境下的构网型控制策略稳定性。")
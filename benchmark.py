@@ -0,0 +1,374 @@
+import argparse
+import copy
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+RESULTS_DIR = "benchmark_results"
+TICK_BUDGET_MS = 1000.0      # 拓扑大屏每秒刷新一次，单次 tick 必须在此预算内完成
+SUITES = ["dashboard", "topology", "knowledge_base", "vector_search", "bm25", "build_rag", "telemetry", "ingest", "analytics"]
+
+# 各测试的规模档位：(快速模式, 完整模式)
+SIZES = {
+    "topology": ([8, 64], [8, 64, 256, 1024]),
+    "vector_search": ([1_000, 10_000], [1_000, 10_000, 100_000]),
+    "build_rag": ([1], [1, 4, 16]),
+    "telemetry": ([100], [100, 500, 2000]),
+    "ingest": ([100_000], [100_000, 1_000_000]),
+    "analytics": ([50], [50, 200, 800]),
+}
+
+
+def timings(fn, repeat, warmup=1):
+    """调用 fn 若干次，返回 {"n", "mean_ms", "p50_ms", "p99_ms", "max_ms"}"""
+    for _ in range(warmup):
+        fn()
+    lat = np.empty(repeat)
+    for i in range(repeat):
+        t = time.perf_counter()
+        fn()
+        lat[i] = time.perf_counter() - t
+    lat *= 1e3
+    return {"n": repeat, "mean_ms": float(lat.mean()), "p50_ms": float(np.percentile(lat, 50)),
+            "p99_ms": float(np.percentile(lat, 99)), "max_ms": float(lat.max())}
+
+
+# =========================================================
+# 1. 拓扑大屏：整页 tick 与 echarts option 构建 / 序列化
+# =========================================================
+def bench_dashboard(ticks=20):
+    """用 AppTest 无浏览器运行拓扑页面，第一次为冷启动，之后每次重跑即一次刷新"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.abspath("pages/2_拓扑结构.py"), default_timeout=120)
+    t = time.perf_counter()
+    at.run()
+    cold = (time.perf_counter() - t) * 1e3
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    row = {"bench": "dashboard_tick", "size": 1, "cold_ms": cold, **timings(at.run, ticks, warmup=0)}
+    row["over_budget"] = row["p99_ms"] > TICK_BUDGET_MS
+    return [row]
+
+
+def scaled_topology_config(n_farms, path=None):
+    """在 config/topology.json 基础上把风电场复制成 n_farms 个（总装机不变），用于观察规模增长的影响"""
+    from utils.topology import TOPOLOGY_CONFIG
+
+    with open(path or TOPOLOGY_CONFIG, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    farms = [n for n in config["nodes"] if n.get("kind") == "farm"]
+    total = sum(n.get("rating_mva", 0.0) for n in farms)
+    farm_ids = {n["id"] for n in farms}
+    template_edge = next(e for e in config["edges"] if e["from"] in farm_ids)
+    nodes, edges = [n for n in config["nodes"] if n["id"] not in farm_ids], [e for e in config["edges"] if e["from"] not in farm_ids]
+    for i in range(n_farms):
+        farm = copy.deepcopy(farms[i % len(farms)])
+        farm.update(id=f"farm{i + 1}", name=f"风电场{i + 1}", rating_mva=total / n_farms,
+                    coord=[farm["coord"][0] - 0.2 * (i // len(farms)), farm["coord"][1]])
+        nodes.insert(i, farm)
+        edges.insert(i, {**template_edge, "from": farm["id"], "rating_mva": total / n_farms})
+    return {**config, "nodes": nodes, "edges": edges}
+
+
+def bench_topology(sizes, ticks=200):
+    """直接计时页面所用的 utils.topology.get_dynamic_topology_option：节点值 + 直流潮流 + option 生成，再加 JSON 序列化（st_echarts 传给前端的开销）"""
+    from utils.power_flow import DcPowerFlow
+    from utils.topology import Topology, TopologyRenderer, get_dynamic_topology_option, wind_flow_period
+
+    rows = []
+    rng = np.random.default_rng(0)
+    for n in sizes:
+        config = scaled_topology_config(n)
+        t = time.perf_counter()
+        renderer = TopologyRenderer(Topology(config))
+        flow_solver = DcPowerFlow(renderer.topology)
+        init_ms = (time.perf_counter() - t) * 1e3
+        winds = rng.uniform(4, 18, ticks + 1)
+        state = {"i": 0}
+
+        def build():
+            i = state["i"] = (state["i"] + 1) % len(winds)
+            wind, power = winds[i], winds[i] * 200
+            state["option"] = get_dynamic_topology_option(renderer, flow_solver, wind_flow_period(wind), wind, power)
+
+        build_stats = timings(build, ticks)
+        option = state["option"]
+        serialize_stats = timings(lambda: json.dumps(option), ticks)
+        rows.append({"bench": "topology_option", "size": n, "init_ms": init_ms, **build_stats})
+        rows.append({"bench": "topology_serialize", "size": n, "bytes": len(json.dumps(option)), **serialize_stats})
+    return rows
+
+
+# =========================================================
+# 2. 知识库检索
+# =========================================================
+SAMPLE_QUERIES = ["直流短路故障如何隔离", "构网型控制的虚拟惯量", "海上换流站的拓扑结构", "弱电网下的稳定性",
+                  "风电场功率波动", "柔性直流输电的损耗", "故障穿越策略", "多端直流系统的协调控制"]
+
+
+def bench_knowledge_base(repeat=50):
+    """load_knowledge_base 冷 / 热加载与 similarity_search 延迟（需要真实嵌入模型）"""
+    from floating_ai import load_knowledge_base
+    from utils.rag_cache import index_version
+
+    version = index_version()
+    load_knowledge_base.clear()
+    t = time.perf_counter()
+    db = load_knowledge_base(version)
+    cold = (time.perf_counter() - t) * 1e3
+    warm = timings(lambda: load_knowledge_base(version), repeat)
+    queries = iter(SAMPLE_QUERIES * (repeat // len(SAMPLE_QUERIES) + 2))
+    search = timings(lambda: db.similarity_search(next(queries), k=3), repeat)
+    return [
+        {"bench": "load_knowledge_base", "size": db.index.ntotal, "cold_ms": cold, **warm},
+        {"bench": "similarity_search", "size": db.index.ntotal, **search},
+    ]
+
+
+def bench_vector_search(sizes, dim=512):
+    """与嵌入模型无关的向量检索延迟随库规模的变化（随机向量，维度同 bge-small）"""
+    from utils.vector_index import benchmark
+
+    rng = np.random.default_rng(0)
+    rows = []
+    for n in sizes:
+        vectors = rng.standard_normal((n, dim)).astype(np.float32)
+        kinds = ["flat", "hnsw"] + (["ivf_flat"] if n >= 10_000 else [])
+        for r in benchmark(vectors, kinds=kinds, n_queries=200):
+            rows.append({"bench": f"vector_search_{r.pop('kind')}", "size": n, **r})
+    return rows
+
+
+def bench_bm25(repeat=200, index_dir="faiss_index"):
+    from utils.sparse_index import SparseIndex
+
+    index = SparseIndex.open(index_dir)
+    if index is None:
+        raise RuntimeError(f"{index_dir} 中没有 BM25 索引")
+    queries = iter(SAMPLE_QUERIES * (repeat // len(SAMPLE_QUERIES) + 2))
+    return [{"bench": "bm25_search", "size": index.meta["n_docs"], **timings(lambda: index.search(next(queries), 10), repeat)}]
+
+
+def bench_build_rag(copies):
+    """把 data 目录复制 n 份到临时目录做全量构建，统计 文档/秒、块/秒（需要真实嵌入模型）"""
+    import build_rag
+
+    rows = []
+    cwd = os.getcwd()
+    sources = [os.path.abspath(os.path.join(build_rag.DATA_DIR, f)) for f in os.listdir(build_rag.DATA_DIR)
+               if os.path.splitext(f)[1].lower() in build_rag.LOADERS]
+    for n in copies:
+        # build_rag 的目录均为相对路径：切换到临时目录构建，不会碰到正式的 faiss_index
+        work = tempfile.mkdtemp(prefix="bench_rag_")
+        try:
+            os.makedirs(os.path.join(work, build_rag.DATA_DIR))
+            for i in range(n):
+                for src in sources:
+                    stem, ext = os.path.splitext(os.path.basename(src))
+                    shutil.copy(src, os.path.join(work, build_rag.DATA_DIR, f"{stem}_{i}{ext}"))
+            os.chdir(work)
+            t = time.perf_counter()
+            build_rag.create_vector_db(full_rebuild=True)
+            elapsed = time.perf_counter() - t
+            manifest = build_rag.load_manifest()
+            if manifest is None:
+                raise RuntimeError("构建失败，未生成清单")
+            files = manifest["files"]
+            chunks = sum(len(v["chunk_ids"]) for v in files.values())
+            rows.append({"bench": "create_vector_db", "size": len(files), "seconds": elapsed, "chunks": chunks,
+                         "docs_per_s": len(files) / elapsed, "chunks_per_s": chunks / elapsed})
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(work, ignore_errors=True)
+    return rows
+
+
+# =========================================================
+# 3. 遥测链路：合成数据生成、流式故障检测、曲线降采样、文件导入
+# =========================================================
+def bench_telemetry(sizes, fs=100.0, seconds=10.0):
+    from utils.downsample import plot_xy
+    from utils.fault_detector import StreamingFaultDetector, make_demo_waveform_source
+    from utils.telemetry_gen import TelemetryGenerator
+
+    rows = []
+    for n in sizes:
+        gen = TelemetryGenerator(n, fs=fs, seed=0)
+        t = time.perf_counter()
+        chunks = list(gen.stream(seconds))
+        elapsed = time.perf_counter() - t
+        rows.append({"bench": "telemetry_gen", "size": n, "seconds": elapsed,
+                     "points_per_s": n * fs * seconds / elapsed, "x_realtime": seconds / elapsed})
+
+        # 故障检测按 3.2 kHz 波形、0.1 s 一块；单块耗时必须小于 100 ms 才能实时
+        detector = StreamingFaultDetector(range(n), fs=3200.0)
+        source = make_demo_waveform_source(n, 3200.0, seed=0)
+        blocks = [source(i * 320, 320) for i in range(10)]
+        it = iter(blocks * 2)
+        rows.append({"bench": "fault_detector_block", "size": n, **timings(lambda: detector.update(*next(it)), 10)})
+
+        series = np.concatenate([c["power"][0] for c in chunks])
+        rows.append({"bench": "plot_xy", "size": len(series), **timings(lambda: plot_xy(None, series, width=800), 50)})
+    return rows
+
+
+def bench_ingest(sizes):
+    """把合成遥测写成 csv 再调用 utils.ingest.ingest 导入为 Parquet，统计 行/秒 与 MB/秒"""
+    from utils.ingest import ingest
+
+    rows = []
+    rng = np.random.default_rng(0)
+    for n in sizes:
+        work = tempfile.mkdtemp(prefix="bench_ingest_")
+        try:
+            path = os.path.join(work, "run.csv")
+            t_axis = np.arange(n) / 1000.0
+            table = np.column_stack([t_axis, rng.normal(0.8, 0.05, n), rng.normal(0, 0.02, n),
+                                     rng.normal(1.0, 0.01, n), rng.normal(50, 0.02, n)])
+            np.savetxt(path, table, delimiter=",", fmt="%.6f", header="时间,有功,无功,电压,频率", comments="")
+            result = ingest(path, "run.csv", out_dir=os.path.join(work, "out"))
+            rows.append({"bench": "ingest_csv", "size": n, "seconds": result["seconds"],
+                         "rows_per_s": n / result["seconds"], "mb_per_s": result["bytes_in"] / 1e6 / result["seconds"]})
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+    return rows
+
+
+def bench_analytics(sizes):
+    """批量仿真一组 VSG 阻尼参数扫描写成 Parquet，再做冷（无缓存）/ 热（已缓存）后处理，统计 运行/秒"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from utils.grid_sim import make_params, simulate
+    from utils.ingest import ARROW_SCHEMA
+    from utils.run_analytics import RunAnalytics
+
+    rows = []
+    for n in sizes:
+        work = tempfile.mkdtemp(prefix="bench_analytics_")
+        try:
+            result = simulate("gfm", make_params(n, D=np.linspace(5, 80, n), v_dip=0.5, dip_duration=0.15), t_end=10.0)
+            for i in range(n):
+                columns = [result["t"], result["power"][i], np.zeros_like(result["t"]), result["voltage"][i], result["freq"][i]]
+                table = pa.Table.from_arrays([pa.array(np.asarray(c, dtype=f.type.to_pandas_dtype())) for c, f in zip(columns, ARROW_SCHEMA)],
+                                             schema=ARROW_SCHEMA)
+                pq.write_table(table, os.path.join(work, f"run{i:05d}.parquet"))
+            analytics = RunAnalytics(directory=os.path.join(work, "analytics"))
+            t = time.perf_counter()
+            analytics.analyze_dir(work)
+            cold = time.perf_counter() - t
+            rows.append({"bench": "analytics_cold", "size": n, "seconds": cold, "runs_per_s": n / cold, "workers": analytics.workers})
+            warm = RunAnalytics(directory=os.path.join(work, "analytics"))
+            rows.append({"bench": "analytics_warm", "size": n, **timings(lambda: warm.analyze_dir(work), 5)})
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+    return rows
+
+
+# =========================================================
+# 运行、保存与对比
+# =========================================================
+def run_suites(suites, quick=False):
+    level = 0 if quick else 1
+    runners = {
+        "dashboard": lambda: bench_dashboard(ticks=5 if quick else 20),
+        "topology": lambda: bench_topology(SIZES["topology"][level]),
+        "knowledge_base": bench_knowledge_base,
+        "vector_search": lambda: bench_vector_search(SIZES["vector_search"][level]),
+        "bm25": bench_bm25,
+        "build_rag": lambda: bench_build_rag(SIZES["build_rag"][level]),
+        "telemetry": lambda: bench_telemetry(SIZES["telemetry"][level]),
+        "ingest": lambda: bench_ingest(SIZES["ingest"][level]),
+        "analytics": lambda: bench_analytics(SIZES["analytics"][level]),
+    }
+    rows = []
+    for name in suites:
+        print(f"▶ {name} ...", flush=True)
+        t = time.perf_counter()
+        try:
+            result = runners[name]()
+        except Exception as e:
+            # 缺少依赖（如嵌入模型）或数据时记录原因并继续其余测试
+            print(f"   跳过：{type(e).__name__}: {str(e)[:200]}")
+            result = [{"bench": name, "size": 0, "error": f"{type(e).__name__}: {e}"}]
+        for row in result:
+            row["suite"] = name
+            print("   " + format_row(row))
+        print(f"   用时 {time.perf_counter() - t:.1f} 秒")
+        rows.extend(result)
+    return rows
+
+
+def format_row(row):
+    if "error" in row:
+        return f"{row['bench']}: 失败"
+    keys = [k for k in ("p50_ms", "p99_ms", "cold_ms", "docs_per_s", "chunks_per_s", "points_per_s", "rows_per_s", "runs_per_s", "recall") if k in row]
+    flag = "  ⚠️ 超出 1 秒刷新预算" if row.get("over_budget") else ""
+    return f"{row['bench']:<28}size={row['size']:<9}" + "  ".join(f"{k}={row[k]:.4g}" for k in keys) + flag
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        commit = ""
+    return {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "commit": commit, "python": sys.version.split()[0],
+            "platform": platform.platform(), "cpu_count": os.cpu_count(), "numpy": np.__version__}
+
+
+# 对比时关注的指标：延迟越小越好，吞吐越大越好
+LOWER_IS_BETTER = ("p50_ms", "p99_ms", "cold_ms", "seconds")
+HIGHER_IS_BETTER = ("docs_per_s", "chunks_per_s", "points_per_s", "rows_per_s", "runs_per_s", "mb_per_s", "recall")
+MIN_DELTA_MS = 0.5           # 亚毫秒级的延迟抖动不算退化
+
+
+def compare(baseline, current, threshold=0.2):
+    """按 (bench, size) 对齐两次结果，返回变差超过 threshold 比例的指标 [(bench, size, 指标, 旧值, 新值, 变化)]"""
+    old = {(r["bench"], r["size"]): r for r in baseline["results"] if "error" not in r}
+    regressions = []
+    for row in current["results"]:
+        base = old.get((row["bench"], row["size"]))
+        if base is None or "error" in row:
+            continue
+        for key in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            if key not in row or key not in base or not base[key]:
+                continue
+            change = row[key] / base[key] - 1
+            if key.endswith("_ms") and abs(row[key] - base[key]) < MIN_DELTA_MS:
+                continue
+            worse = change > threshold if key in LOWER_IS_BETTER else change < -threshold
+            if worse:
+                regressions.append((row["bench"], row["size"], key, base[key], row[key], change))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="无浏览器的端到端性能基准测试，结果保存为 JSON 便于回归对比")
+    parser.add_argument("--only", nargs="+", choices=SUITES, default=SUITES, help="只运行指定的测试")
+    parser.add_argument("--quick", action="store_true", help="只跑小规模档位")
+    parser.add_argument("--out", help=f"结果文件路径，默认 {RESULTS_DIR}/<时间>.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="与之前保存的结果对比，有退化时以非零状态退出")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定为退化的相对变化（默认 20%%）")
+    args = parser.parse_args()
+
+    report = {"environment": environment(), "quick": args.quick, "results": run_suites(args.only, args.quick)}
+    out = args.out or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"结果已保存到 {out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        for bench, size, key, old, new, change in regressions:
+            print(f"   ⚠️ {bench} size={size} {key}: {old:.4g} -> {new:.4g}（{change:+.0%}）")
+        print(f"对比 {args.compare}：{len(regressions)} 项退化超过 {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
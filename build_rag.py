@@ -1,55 +1,345 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
 import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import faiss
 from langchain_community.document_loaders import Docx2txtLoader, UnstructuredPowerPointLoader, PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
+from utils.docstore import DOCSTORE_NAME, export_docstore
+from utils.sparse_index import SPARSE_DIR_NAME, build_sparse_index
+from utils.vector_index import DEFAULT_SEARCH_PARAMS, INDEX_TYPES, SEARCH_INDEX_NAME, benchmark, build_search_index
+
+DATA_DIR = "data/"
+INDEX_DIR = "faiss_index"
+MANIFEST_NAME = "manifest.json"
+EMBEDDING_MODEL = "BAAI/bge-small-zh-v1.5"
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+# 流水线默认参数：解析是 CPU 密集型，用多进程；嵌入模型内部释放 GIL，用少量线程即可
+LOAD_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+EMBED_THREADS = 2
+BATCH_SIZE = 64
+QUEUE_SIZE = 8
+
+# 扩展名 -> (显示名称, 加载器)
+LOADERS = {
+    ".docx": ("Word", Docx2txtLoader),
+    ".pptx": ("PPT", UnstructuredPowerPointLoader),
+    ".pdf": ("PDF", PyPDFLoader),
+}
+
+
+def file_hash(filepath):
+    """按内容计算文件哈希（分块读取）"""
+    h = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_manifest(index_dir=INDEX_DIR):
+    """
+    读取清单：{"version", "embedding_model", "chunk_size", "chunk_overlap", "files": {文件名: {"hash", "chunk_ids"}}}
+    清单不存在或构建参数不一致时返回 None
+    """
+    try:
+        with open(os.path.join(index_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if (manifest.get("embedding_model"), manifest.get("chunk_size"), manifest.get("chunk_overlap")) != (EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP):
+        return None
+    return manifest
 
-def create_vector_db():
-    print("1. 正在扫描 data 目录下的文档...")
-    docs = []
-    data_dir = "data/"
-    
-    # 确保 data 文件夹存在
-    if not os.path.exists(data_dir):
-        print(f"错误：找不到 {data_dir} 文件夹！")
-        return
 
-    # 遍历文件夹，智能匹配不同格式的文件
-    for filename in os.listdir(data_dir):
-        filepath = os.path.join(data_dir, filename)
-        
+def legacy_manifest(db):
+    """旧版索引没有清单：按文档 metadata 的 source 归组，哈希未知，相当于全部待更新"""
+    files = {}
+    for doc_id in db.index_to_docstore_id.values():
+        doc = db.docstore.search(doc_id)
+        source = os.path.basename(getattr(doc, "metadata", {}).get("source", ""))
+        files.setdefault(source, {"hash": None, "chunk_ids": []})["chunk_ids"].append(doc_id)
+    return {"version": 0, "files": files}
+
+
+def scan_data_dir(data_dir=DATA_DIR):
+    """当前 data 目录中受支持的文件 {文件名: 哈希}"""
+    return {
+        filename: file_hash(os.path.join(data_dir, filename))
+        for filename in sorted(os.listdir(data_dir))
+        if os.path.splitext(filename)[1].lower() in LOADERS
+    }
+
+
+def load_and_split(filename, digest, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, data_dir=DATA_DIR):
+    """
+    读取单个文件并切块（在解析进程池中执行）
+    块 id 由文件名、内容哈希与序号决定（文件不变则 id 不变）
+    """
+    filepath = os.path.join(data_dir, filename)
+    loader_cls = LOADERS[os.path.splitext(filename)[1].lower()][1]
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = text_splitter.split_documents(loader_cls(filepath).load())
+    for chunk in chunks:
+        chunk.metadata["doc_hash"] = digest
+    prefix = hashlib.sha1(f"{filename}:{digest}".encode("utf-8")).hexdigest()[:16]
+    ids = [f"{prefix}-{i:05d}" for i in range(len(chunks))]
+    return chunks, ids
+
+
+def run_pipeline(files, embeddings, load_workers=LOAD_WORKERS, embed_threads=EMBED_THREADS,
+                 batch_size=BATCH_SIZE, queue_size=QUEUE_SIZE):
+    """
+    三级流水线：解析进程池 -> 有界批次队列 -> 嵌入线程组
+    files 为 {文件名: 哈希}；逐条产出
+      ("file", 文件名, chunk_ids)            文件解析成功（先于它的所有批次产出）
+      ("error", 文件名, 异常)                文件解析失败
+      ("batch", texts, metadatas, ids, vectors)
+    有界队列使解析跑得再快也只积压 queue_size 个批次，内存占用与文档总量无关
+    """
+    batches = queue.Queue(maxsize=queue_size)
+    results = queue.Queue()
+    stop = threading.Event()
+
+    def produce():
+        # spawn 启动子进程，避免 fork 已加载的模型线程状态
+        ctx = multiprocessing.get_context("spawn")
         try:
-            if filename.endswith(".docx"):
-                print(f"   -> 正在读取 Word: {filename}")
-                loader = Docx2txtLoader(filepath)
-                docs.extend(loader.load())
-            elif filename.endswith(".pptx"):
-                print(f"   -> 正在读取 PPT: {filename}")
-                loader = UnstructuredPowerPointLoader(filepath)
-                docs.extend(loader.load())
-            elif filename.endswith(".pdf"):
-                print(f"   -> 正在读取 PDF: {filename}")
-                loader = PyPDFLoader(filepath)
-                docs.extend(loader.load())
+            with ProcessPoolExecutor(max_workers=load_workers, mp_context=ctx) as pool:
+                futures = {pool.submit(load_and_split, f, digest): f for f, digest in files.items()}
+                for future in as_completed(futures):
+                    if stop.is_set():
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        return
+                    filename = futures[future]
+                    try:
+                        chunks, ids = future.result()
+                    except Exception as e:
+                        results.put(("error", filename, e))
+                        continue
+                    results.put(("file", filename, ids))
+                    for i in range(0, len(chunks), batch_size):
+                        if stop.is_set():
+                            return
+                        batches.put((chunks[i:i + batch_size], ids[i:i + batch_size]))
+        finally:
+            for _ in range(embed_threads):
+                batches.put(None)
+
+    def embed():
+        try:
+            while (item := batches.get()) is not None:
+                if stop.is_set():
+                    continue
+                chunks, ids = item
+                texts = [c.page_content for c in chunks]
+                vectors = embeddings.embed_documents(texts)
+                results.put(("batch", texts, [c.metadata for c in chunks], ids, vectors))
         except Exception as e:
-            print(f"   ❌ 读取 {filename} 时出错: {e}")
+            results.put(("fatal", e))
+        finally:
+            results.put(("done",))
+
+    threads = [threading.Thread(target=produce, name="rag-loader", daemon=True)]
+    threads += [threading.Thread(target=embed, name=f"rag-embed-{i}", daemon=True) for i in range(embed_threads)]
+    for t in threads:
+        t.start()
+    done = 0
+    try:
+        while done < embed_threads:
+            item = results.get()
+            if item[0] == "done":
+                done += 1
+            elif item[0] == "fatal":
+                raise item[1]
+            else:
+                yield item
+    finally:
+        # 出错或提前退出时让各级尽快停下（排空批次队列，解除生产者阻塞）
+        stop.set()
+        while done < embed_threads:
+            try:
+                batches.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                if results.get(timeout=0.1)[0] == "done":
+                    done += 1
+            except queue.Empty:
+                pass
 
-    if not docs:
+
+def save_atomically(db, manifest, index_dir=INDEX_DIR):
+    """
+    先完整写入临时目录，再整体替换旧索引，构建过程中旧索引始终可用。目录内容：
+      index.faiss + index.pkl   精确索引与文档（构建侧增量更新用）
+      search.faiss              按 index_type 训练的检索索引（应用侧内存映射读取）
+      docstore.sqlite3          文档库（应用侧按需读取）
+      bm25/                     稀疏索引
+      manifest.json             清单
+    """
+    tmp_dir = index_dir + ".tmp"
+    old_dir = index_dir + ".old"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    db.save_local(tmp_dir)
+    index_type = manifest["index_type"]
+    if index_type != "flat":
+        t0 = time.perf_counter()
+        vectors = db.index.reconstruct_n(0, db.index.ntotal)
+        try:
+            faiss.write_index(build_search_index(vectors, index_type), os.path.join(tmp_dir, SEARCH_INDEX_NAME))
+            print(f"   -> 已训练并生成 {index_type} 检索索引，用时 {time.perf_counter() - t0:.1f} 秒")
+        except ValueError as e:
+            # 知识块太少不足以训练时，应用侧直接使用精确索引
+            print(f"   ⚠️ {e}，暂用精确检索")
+            manifest["search_params"] = {}
+    export_docstore(db, os.path.join(tmp_dir, DOCSTORE_NAME))
+    # 稀疏（BM25）索引随向量索引一起放在同一目录，二者版本始终一致
+    ids = list(db.index_to_docstore_id.values())
+    texts = [db.docstore.search(i).page_content for i in ids]
+    meta = build_sparse_index(ids, texts, os.path.join(tmp_dir, SPARSE_DIR_NAME))
+    print(f"   -> 已生成 BM25 稀疏索引（{meta['tokenizer']} 分词，{meta['n_docs']} 个知识块）")
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(index_dir):
+        os.replace(index_dir, old_dir)
+    os.replace(tmp_dir, index_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def create_vector_db(full_rebuild=False, load_workers=LOAD_WORKERS, embed_threads=EMBED_THREADS,
+                     batch_size=BATCH_SIZE, queue_size=QUEUE_SIZE, index_type="flat"):
+    print("1. 正在扫描 data 目录下的文档...")
+
+    # 确保 data 文件夹存在
+    if not os.path.exists(DATA_DIR):
+        print(f"错误：找不到 {DATA_DIR} 文件夹！")
+        return
+
+    current = scan_data_dir()
+    if not current:
         print("\n错误：没有在 data 目录下找到任何支持的文档内容！请确保文件不是空的，且格式为 docx/pptx/pdf。")
         return
 
-    print(f"\n2. 成功读取内容，正在将文档切分成知识块...")
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    chunks = text_splitter.split_documents(docs)
+    print("2. 正在加载本地嵌入模型 (初次运行需下载模型，请耐心等待)...")
+    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL, encode_kwargs={"batch_size": batch_size})
+
+    # 载入已有索引与清单；构建参数变化或显式要求时全量重建
+    db, manifest = None, None
+    if not full_rebuild and os.path.exists(os.path.join(INDEX_DIR, "index.faiss")):
+        manifest = load_manifest()
+        if manifest is not None:
+            db = FAISS.load_local(INDEX_DIR, embeddings, allow_dangerous_deserialization=True)
+        elif os.path.exists(os.path.join(INDEX_DIR, MANIFEST_NAME)):
+            # 嵌入模型或切块参数变了：旧向量与新向量不可混用（维度也可能不同），只能全量重建
+            print("   -> 嵌入模型或切块参数已变化，将全量重建")
+        else:
+            print("   -> 旧版索引没有构建清单，将按文档来源做一次迁移")
+            db = FAISS.load_local(INDEX_DIR, embeddings, allow_dangerous_deserialization=True)
+            manifest = legacy_manifest(db)
+    if manifest is None:
+        manifest = {"version": 0, "files": {}}
+    old_files = manifest["files"]
+
+    added = [f for f in current if f not in old_files]
+    changed = [f for f in current if f in old_files and old_files[f]["hash"] != current[f]]
+    removed = [f for f in old_files if f not in current]
+    print(f"3. 文档变更：新增 {len(added)}，修改 {len(changed)}，删除 {len(removed)}，未变 {len(current) - len(added) - len(changed)}")
+
+    # 检索索引类型变化或还没有导出文档库时，即使文档未变也要重新保存
+    layout_changed = manifest.get("index_type") != index_type or not os.path.exists(os.path.join(INDEX_DIR, DOCSTORE_NAME))
+    if db is not None and not (added or changed or removed or layout_changed):
+        print("✅ 知识库已是最新，无需更新。")
+        return
+
+    # 只对新增与修改的文档切块、嵌入；读取失败的文档保留旧向量，下次再试
+    todo = {f: current[f] for f in added + changed}
+    print(f"4. 正在并行读取、切分并嵌入 {len(todo)} 个文档（解析进程 {load_workers}，嵌入线程 {embed_threads}，批大小 {batch_size}）...")
+    new_files = {f: v for f, v in old_files.items() if f in current}
+    if db is not None and removed:
+        db.delete([i for f in removed for i in old_files[f]["chunk_ids"]])
+
+    t0 = time.perf_counter()
+    n_docs = n_chunks = 0
+    for item in run_pipeline(todo, embeddings, load_workers, embed_threads, batch_size, queue_size):
+        if item[0] == "error":
+            print(f"   ❌ 读取 {item[1]} 时出错: {item[2]}")
+        elif item[0] == "file":
+            _, filename, ids = item
+            print(f"   -> 已切分 {LOADERS[os.path.splitext(filename)[1].lower()][0]}: {filename}（{len(ids)} 块）")
+            # 文档已成功重新切分，删除它的旧向量
+            if db is not None and filename in old_files:
+                db.delete(old_files[filename]["chunk_ids"])
+            new_files[filename] = {"hash": current[filename], "chunk_ids": ids}
+            n_docs += 1
+        else:
+            _, texts, metadatas, ids, vectors = item
+            if db is None:
+                db = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=metadatas, ids=ids)
+            else:
+                db.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+            n_chunks += len(ids)
+    elapsed = max(time.perf_counter() - t0, 1e-9)
+    print(f"   -> 共 {n_docs} 个文档、{n_chunks} 个知识块，用时 {elapsed:.1f} 秒"
+          f"（{n_docs / elapsed:.2f} 文档/秒，{n_chunks / elapsed:.1f} 块/秒）")
+
+    if n_docs == 0 and not removed and not layout_changed and db is not None:
+        print("\n⚠️ 没有成功读取任何新增/修改的文档，知识库保持不变。")
+        return
+
+    if db is None or not db.index_to_docstore_id:
+        print("\n错误：没有成功读取任何文档内容，知识库未更新。")
+        return
+
+    manifest = {
+        "version": manifest.get("version", 0) + 1,
+        "embedding_model": EMBEDDING_MODEL,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "index_type": index_type,
+        "search_params": DEFAULT_SEARCH_PARAMS[index_type],
+        "files": new_files,
+    }
+    save_atomically(db, manifest)
+    print(f"✅ 知识库更新完成（版本 {manifest['version']}，共 {len(db.index_to_docstore_id)} 个知识块，{index_type} 检索索引），已保存在 {INDEX_DIR} 文件夹中。")
 
-    print("3. 正在加载本地嵌入模型 (初次运行需下载模型，请耐心等待)...")
-    embeddings = HuggingFaceEmbeddings(model_name="BAAI/bge-small-zh-v1.5")
 
-    print("4. 正在生成向量数据库...")
-    db = FAISS.from_documents(chunks, embeddings)
-    
-    db.save_local("faiss_index")
-    print("✅ 知识库构建完成！已保存在 faiss_index 文件夹中。")
+def run_benchmark(index_dir=INDEX_DIR, k=10):
+    """对现有知识库向量比较各检索索引的召回率与延迟（不需要加载嵌入模型）"""
+    index = faiss.read_index(os.path.join(index_dir, "index.faiss"))
+    vectors = index.reconstruct_n(0, index.ntotal)
+    print(f"基准测试：{index.ntotal} 个向量，维度 {index.d}，Top-{k}")
+    print(f"{'索引类型':<10}{'构建(s)':>10}{'召回率':>10}{'P50(ms)':>10}{'P95(ms)':>10}{'大小(MB)':>10}")
+    for row in benchmark(vectors, k=k):
+        if "error" in row:
+            print(f"{row['kind']:<12}跳过：{row['error']}")
+            continue
+        print(f"{row['kind']:<12}{row['build_s']:>10.2f}{row['recall']:>10.3f}{row['p50_ms']:>10.3f}"
+              f"{row['p95_ms']:>10.3f}{row['bytes'] / 1e6:>10.1f}")
 
 if __name__ == "__main__":
-    create_vector_db()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="构建/增量更新知识库向量索引")
+    parser.add_argument("--full", action="store_true", help="忽略清单，全量重建")
+    parser.add_argument("--workers", type=int, default=LOAD_WORKERS, help="文档解析进程数")
+    parser.add_argument("--embed-threads", type=int, default=EMBED_THREADS, help="嵌入线程数")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="每批嵌入的知识块数")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="待嵌入批次队列上限")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat", help="检索索引类型")
+    parser.add_argument("--benchmark", action="store_true", help="只对现有知识库做各索引类型的召回率/延迟基准测试")
+    args = parser.parse_args()
+    if args.benchmark:
+        run_benchmark()
+    else:
+        create_vector_db(args.full, args.workers, args.embed_threads, args.batch_size, args.queue_size, args.index_type)
\ No newline at end of file
@@ -1,26 +1,136 @@
 import streamlit as st
-from openai import OpenAI
 import time
-# --- RAG 必需的依赖库 ---
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+import uuid
+# --- RAG 依赖：langchain / 嵌入模型 / FAISS / openai 都在首次使用时才导入（由后台预热提前完成） ---
+from utils.rag_cache import QueryCache, index_version
+from utils.sparse_index import SparseIndex
+from utils.rag_context import assemble_context, compact_history, CONTEXT_BUDGET, HISTORY_BUDGET, SUMMARY_BUDGET
+from utils.llm_client import LLMService, DEFAULT_BASE_URL, DEFAULT_MODEL, QUEUED, ERROR, CANCELLED
+from utils.warmup import start_warm_up
+from utils.perf import REGISTRY, timed
+from utils.render_cache import ChatTranscript
 
 # =========================================================
 # 0. 核心模块：加载本地向量知识库 (之前缺失的就是这一段)
 # =========================================================
-@st.cache_resource
-def load_knowledge_base():
+EMBEDDING_MODEL = "BAAI/bge-small-zh-v1.5"
+
+@st.cache_resource(max_entries=1)
+def load_knowledge_base(version=None):
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from utils.docstore import load_vector_store
+
     # 使用与 build_rag.py 中相同的模型
-    embeddings = HuggingFaceEmbeddings(model_name="BAAI/bge-small-zh-v1.5")
-    # 加载已生成的 faiss_index 文件夹
-    db = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
+    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    # 加载已生成的 faiss_index 文件夹（检索索引内存映射、文档按需读取）；version 变化（索引被重建）时重新加载
+    db = load_vector_store("faiss_index", embeddings)
     return db
 
 
+@st.cache_resource(max_entries=1)
+def load_sparse_index(version=None):
+    # build_rag.py 生成的 BM25 稀疏索引（内存映射），旧版索引没有时返回 None
+    return SparseIndex.open("faiss_index")
+
+
+@st.cache_resource
+def get_query_cache():
+    """全进程共享的问题向量 / 检索结果缓存"""
+    return QueryCache()
+
+
+def search_knowledge_base(query, k=3, fetch_k=None):
+    """
+    带两级缓存的 BM25 + 向量混合检索：重复问题跳过嵌入与搜索；给出 fetch_k 时向量侧用 MMR 去冗余
+    """
+    version = index_version()
+    return get_query_cache().search(lambda: load_knowledge_base(version), version, query, k=k,
+                                    model=EMBEDDING_MODEL, fetch_k=fetch_k,
+                                    load_sparse=lambda: load_sparse_index(version))
+
+
+@st.cache_resource
+def start_ai_warm_up():
+    """每个进程只执行一次：后台导入 AI 依赖、加载嵌入模型与索引并做一次推理，返回 StartupReport"""
+    return start_warm_up([
+        ("加载嵌入模型与向量索引", lambda: load_knowledge_base(index_version())),
+        ("首次嵌入推理", lambda: load_knowledge_base(index_version()).embeddings.embed_query("预热")),
+        ("加载 BM25 稀疏索引", lambda: load_sparse_index(index_version())),
+    ])
+
+
+@st.cache_resource
+def get_llm_service(api_key, base_url, model):
+    """全进程共享的异步大模型客户端（后台事件循环 + 连接池）"""
+    service = LLMService(api_key, base_url=base_url, model=model, max_concurrency=4)
+    REGISTRY.add_collector("llm_service", service.stats)
+    return service
+
+
+def get_session_id():
+    if "ai_session_id" not in st.session_state:
+        st.session_state.ai_session_id = uuid.uuid4().hex
+    return st.session_state.ai_session_id
+
+
+@timed("ai.build_messages")
+def build_messages(history, prompt):
+    """在后台线程中执行：检索知识库并按 token 预算拼装发给模型的消息"""
+    # 多取候选再用 MMR 选出互不重复的若干块，按预算放入参考资料
+    search_docs = search_knowledge_base(prompt, k=4, fetch_k=12)
+    context = assemble_context(search_docs, CONTEXT_BUDGET)
+    rag_prompt = f"""你是一个深远海风电电气工程专家。
+    请严格根据以下【参考资料】回答【用户问题】。
+    如果参考资料中没有相关答案，请直接回答“知识库中未找到相关内容”，不要随意编造。
+    
+    【参考资料】：
+    {context}
+    
+    【用户问题】：
+    {prompt}
+    """
+    # 近期对话原样保留、更早的压缩成摘要，再把带知识库的 Prompt 伪装成最后一条用户消息发给 API
+    return compact_history(history, HISTORY_BUDGET, SUMMARY_BUDGET) + [{"role": "user", "content": rag_prompt}]
+
+
+@st.fragment(run_every=0.5)
+def render_pending_answer():
+    """轮询后台任务，增量显示已生成的文本；结束后写入历史并整页刷新一次"""
+    job = st.session_state.get("ai_job")
+    if job is None:
+        return
+    job.touch()
+    with st.chat_message("assistant"):
+        if job.status == QUEUED:
+            st.caption("📚 正在翻阅风电知识库...")
+        elif not job.finished:
+            st.markdown(job.text + " ▌" if job.text else "🤖 智多星正在思考...")
+            st.button("⏹ 停止生成", key=f"ai_stop_{job.id}", on_click=job.cancel)
+        else:
+            st.markdown(job.text)
+    if not job.finished:
+        return
+    if job.status == ERROR:
+        content = f"🚨 运行中断，后台报错信息: {job.error}"
+    elif job.status == CANCELLED:
+        content = (job.text + "\n\n（已停止生成）").strip()
+    else:
+        content = job.text
+    st.session_state.ai_messages.append({"role": "assistant", "content": content})
+    st.session_state.ai_job = None
+    st.rerun(scope="app")
+
+
 # =========================================================
 # 1. 主函数：渲染悬浮助手界面与交互逻辑
 # =========================================================
+LIVE_MESSAGES = 6           # 至少按聊天气泡单独渲染的最近消息条数
+
+@timed
 def render_floating_ai():
+    # 任何页面首次打开时即在后台预热助手，避免第一次提问时才加载模型
+    start_ai_warm_up()
+
     # --- CSS 样式注入 ---
     st.markdown("""
     <style>
@@ -99,63 +209,37 @@ def render_floating_ai():
         # 聊天记录容器
         chat_container = st.container(height=350)
         with chat_container:
-            for msg in st.session_state.ai_messages:
+            # 较早的对话按固定条数归档成不再变化的段（重跑时只下发引用），最近几条按聊天气泡逐条渲染
+            messages = st.session_state.ai_messages
+            transcript = st.session_state.setdefault("ai_transcript", ChatTranscript())
+            n_archived = transcript.archived(len(messages), LIVE_MESSAGES)
+            for block in transcript.sync(messages[:n_archived]):
+                st.markdown(block)
+            for msg in messages[n_archived:]:
                 with st.chat_message(msg["role"]):
                     st.markdown(msg["content"])
+            # 正在生成的回答：由局部刷新轮询后台任务，不阻塞页面其余部分
+            if st.session_state.get("ai_job") is not None:
+                render_pending_answer()
 
         # 输入框处理
         if prompt := st.chat_input("请输入问题...", key="floating_chat_input_final"):
             st.session_state.ai_messages.append({"role": "user", "content": prompt})
-            with chat_container:
-                with st.chat_message("user"):
-                    st.markdown(prompt)
-            
-            with chat_container:
-                with st.chat_message("assistant"):
-                    if "DEEPSEEK_API_KEY" not in st.secrets:
-                        error_msg = "⚠️ 平台未检测到 DEEPSEEK_API_KEY！请在项目根目录创建 `.streamlit/secrets.toml` 文件配置密钥。"
-                        st.error(error_msg)
-                        st.session_state.ai_messages.append({"role": "assistant", "content": error_msg})
-                    else:
-                        try:
-                            # 1. 翻阅知识库
-                            with st.spinner("📚 正在翻阅风电知识库..."):
-                                db = load_knowledge_base()
-                                search_docs = db.similarity_search(prompt, k=3)
-                                context = "\n\n".join([doc.page_content for doc in search_docs])
-                            
-                            # 2. 调用大模型
-                            with st.spinner("🤖 智多星正在思考..."):
-                                rag_prompt = f"""你是一个深远海风电电气工程专家。
-                                请严格根据以下【参考资料】回答【用户问题】。
-                                如果参考资料中没有相关答案，请直接回答“知识库中未找到相关内容”，不要随意编造。
-                                
-                                【参考资料】：
-                                {context}
-                                
-                                【用户问题】：
-                                {prompt}
-                                """
-                                
-                                # 将带知识库的 Prompt 伪装成最后一条用户消息发给 API
-                                api_messages = [{"role": m["role"], "content": m["content"]} for m in st.session_state.ai_messages[:-1]]
-                                api_messages.append({"role": "user", "content": rag_prompt})
-                                
-                                client = OpenAI(
-                                    api_key=st.secrets["DEEPSEEK_API_KEY"],
-                                    base_url="https://api.deepseek.com"
-                                )
-                                stream = client.chat.completions.create(
-                                    model="deepseek-chat",
-                                    messages=api_messages,
-                                    stream=True,
-                                )
-                                response = st.write_stream(stream)
-                                st.session_state.ai_messages.append({"role": "assistant", "content": response})
-                        
-                        except Exception as e:
-                            error_msg = f"🚨 运行中断，后台报错信息: {e}"
-                            st.error(error_msg)
-                            st.session_state.ai_messages.append({"role": "assistant", "content": error_msg})
-            
+            if "DEEPSEEK_API_KEY" not in st.secrets:
+                error_msg = "⚠️ 平台未检测到 DEEPSEEK_API_KEY！请在项目根目录创建 `.streamlit/secrets.toml` 文件配置密钥。"
+                st.session_state.ai_messages.append({"role": "assistant", "content": error_msg})
+            else:
+                history = [{"role": m["role"], "content": m["content"]} for m in st.session_state.ai_messages[:-1]]
+                try:
+                    service = get_llm_service(
+                        st.secrets["DEEPSEEK_API_KEY"],
+                        st.secrets.get("DEEPSEEK_BASE_URL", DEFAULT_BASE_URL),
+                        st.secrets.get("DEEPSEEK_MODEL", DEFAULT_MODEL),
+                    )
+                    # 上一个回答还没结束就提问：先取消它
+                    if st.session_state.get("ai_job") is not None:
+                        st.session_state.ai_job.cancel()
+                    st.session_state.ai_job = service.submit(get_session_id(), lambda: build_messages(history, prompt))
+                except Exception as e:
+                    st.session_state.ai_messages.append({"role": "assistant", "content": f"🚨 运行中断，后台报错信息: {e}"})
             st.rerun()
\ No newline at end of file
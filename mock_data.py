@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+from utils.telemetry_gen import TelemetryGenerator
 
 def get_steady_state_data():
     """
@@ -7,16 +8,17 @@ def get_steady_state_data():
     包含：时间戳、风速、总功率、直流母线电压
     """
     # 模拟24小时，每小时一个点（演示时可以加速播放）
-    times = pd.date_range("2024-01-01 00:00", "2024-01-01 23:59", freq="1H")
+    times = pd.date_range("2024-01-01 00:00", "2024-01-01 23:59", freq="1h")
     
-    # 随机生成数据，保持在合理范围内
+    # 50 台 100 MW 机组：风速按小时级自相关的 Weibull 过程生成，功率由功率曲线折算，时间上连续而非逐点独立
+    data = TelemetryGenerator(50, fs=1 / 3600, tau=6 * 3600, rated_mw=100.0).chunk(len(times))
     df = pd.DataFrame({
         "Time": times.strftime("%H:%M:%S"),
-        # 风速：5-12m/s之间波动 [cite: 22]
-        "Wind_Speed": np.round(np.random.uniform(5, 12, len(times)), 1),
-        # 功率：2000-5000MW之间波动 [cite: 23]
-        "Power_Total": np.random.randint(2000, 5000, len(times)),
+        # 风速：集群平均风速 [cite: 22]
+        "Wind_Speed": np.round(data["wind"].mean(axis=0), 1),
+        # 功率：集群总出力 MW [cite: 23]
+        "Power_Total": np.round(data["power"].sum(axis=0)).astype(int),
         # 电压：500kV上下微小跳动 [cite: 24]
-        "U_DC": np.round(np.random.normal(500, 2, len(times)), 2)
+        "U_DC": np.round(data["u_dc"].mean(axis=0), 2)
     })
     return df
\ No newline at end of file
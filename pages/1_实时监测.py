@@ -1,7 +1,10 @@
 import streamlit as st
-import numpy as np
 import plotly.graph_objs as go
 from utils.common import set_page_style
+from utils.downsample import plot_xy
+from utils.grid_sim import make_params, simulate_vsg, simulate_gfl
+from utils.perf import timer
+from utils.render_cache import cached_figure
 from floating_ai import render_floating_ai
 
 set_page_style()
@@ -30,18 +33,39 @@ st.markdown("---")
 
 # --- 对比曲线 ---
 st.subheader("控制策略对比分析")
-t = np.arange(0, 10, 0.1)
-y_gfm = 50 + 0.02 * np.exp(-t) * np.sin(2 * t)
-y_gfl = 50 + 0.08 * np.exp(-0.3 * t) * np.sin(2 * t)
 
+@st.cache_data
+def get_frequency_response(H, D, SCR):
+    """同一负荷阶跃下，构网型 VSG 与跟网型 PLL 的频率响应（两种模型各仿真一次，结果按参数缓存）"""
+    params = make_params(1, H=H, D=D, SCR=SCR)
+    gfm = simulate_vsg(params)
+    gfl = simulate_gfl(params)
+    return gfm["t"], gfm["freq"][0], gfl["freq"][0]
+
+with st.expander("仿真参数（10% 负荷阶跃）"):
+    c_h, c_d, c_scr = st.columns(3)
+    H = c_h.slider("虚拟惯量 H (s)", 1.0, 10.0, 5.0, 0.5)
+    D = c_d.slider("阻尼系数 D", 5.0, 60.0, 20.0, 5.0)
+    SCR = c_scr.slider("短路比 SCR", 1.2, 5.0, 2.5, 0.1)
+
+def make_gfm_figure(H, D, SCR):
+    t, y_gfm, _ = get_frequency_response(H, D, SCR)
+    fig = go.Figure(go.Scatter(**plot_xy(t, y_gfm, width=600), name="构网型控制"))
+    fig.update_layout(title="构网型控制下频率响应", xaxis_title="时间(s)", yaxis_title="频率(Hz)", template="plotly_white")
+    return fig
+
+def make_gfl_figure(H, D, SCR):
+    t, _, y_gfl = get_frequency_response(H, D, SCR)
+    fig = go.Figure(go.Scatter(**plot_xy(t, y_gfl, width=600), name="传统跟网型控制", line=dict(dash='dash', color='orange')))
+    fig.update_layout(title="传统控制下频率响应", xaxis_title="时间(s)", yaxis_title="频率(Hz)", template="plotly_white")
+    return fig
+
+# 同一组参数的图对象全进程只构建一次，重跑时直接复用
 col_left, col_right = st.columns(2)
-with col_left:
-    fig1 = go.Figure(go.Scatter(x=t, y=y_gfm, name="构网型控制"))
-    fig1.update_layout(title="构网型控制下频率响应", xaxis_title="时间(s)", yaxis_title="频率(Hz)", template="plotly_white")
-    st.plotly_chart(fig1, use_container_width=True)
-with col_right:
-    fig2 = go.Figure(go.Scatter(x=t, y=y_gfl, name="传统跟网型控制", line=dict(dash='dash', color='orange')))
-    fig2.update_layout(title="传统控制下频率响应", xaxis_title="时间(s)", yaxis_title="频率(Hz)", template="plotly_white")
-    st.plotly_chart(fig2, use_container_width=True)
+with timer("monitor.figures"):
+    with col_left:
+        st.plotly_chart(cached_figure("monitor.gfm", make_gfm_figure, H, D, SCR), use_container_width=True)
+    with col_right:
+        st.plotly_chart(cached_figure("monitor.gfl", make_gfl_figure, H, D, SCR), use_container_width=True)
 
 render_floating_ai()
\ No newline at end of file
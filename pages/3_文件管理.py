@@ -1,24 +1,80 @@
-import streamlit as st
-import pandas as pd
 import numpy as np
+import pandas as pd
+import streamlit as st
 from utils.common import set_page_style
+from utils.ingest import ingest, read_preview
+from utils.run_analytics import RunAnalytics, METRIC_LABELS, run_id, summarize, damping_grade
 from floating_ai import render_floating_ai
 
 set_page_style()
 
+@st.cache_resource
+def get_run_analytics():
+    # 进程内共用一个实例，已分析过的运行结果常驻内存
+    return RunAnalytics()
+
 st.title("文件管理与分析")
 
 st.subheader("历史仿真性能摘要")
 c1, c2, c3 = st.columns(3)
-c1.metric("平均电压跌落深度", "12.4%", "-2.1%")
-c2.metric("频率恢复耗时", "0.42 s", "-0.05 s")
-c3.metric("VSG阻尼比评估", "0.707", "优")
+summary_caption = st.empty()
 
 uploaded_file = st.file_uploader("上传仿真数据 (.csv, .xlsx)", type=["csv", "xlsx"])
 
-df = pd.DataFrame(np.random.randn(5, 5), columns=['时间', '有功', '无功', '电压', '频率'])
+# 上传文件流式转换为 Parquet，同一文件只转换一次；预览与后续分析都只读转换后的文件
+if uploaded_file is not None and st.session_state.get("ingested_file_id") != uploaded_file.file_id:
+    try:
+        with st.spinner("正在流式解析并转换为列式存储..."):
+            st.session_state.ingest_result = ingest(uploaded_file, uploaded_file.name)
+        st.session_state.ingest_error = None
+    except ValueError as e:
+        # 记下失败的文件，避免每次重跑都重新哈希、解析同一个坏文件
+        st.session_state.pop("ingest_result", None)
+        st.session_state.ingest_error = str(e)
+    st.session_state.ingested_file_id = uploaded_file.file_id
+
+if uploaded_file is not None and st.session_state.get("ingest_error"):
+    st.error(f"数据校验失败：{st.session_state.ingest_error}")
+
+result = st.session_state.get("ingest_result") if uploaded_file is not None else None
+
+# 摘要为所有已导入运行的均值；有当前上传文件时，增量显示该次运行相对均值的差
+with st.spinner("正在分析历史仿真运行..."):
+    runs = get_run_analytics().analyze_dir()
+summary = summarize(runs)
+current = next((r for r in runs if result and r["run"] == run_id(result["path"]) and "error" not in r), None)
+
+def delta(key, fmt):
+    if current is None or not np.isfinite(current[key]) or not np.isfinite(summary[key]):
+        return None
+    return fmt.format(current[key] - summary[key])
+
+if summary["runs"]:
+    zeta = summary["damping"]
+    c1.metric("平均电压跌落深度", f"{summary['sag_depth']:.1%}", delta("sag_depth", "{:+.1%}"), delta_color="inverse")
+    settling = summary["settling_time"]
+    c2.metric("频率恢复耗时", f"{settling:.2f} s" if np.isfinite(settling) else ("未恢复" if summary["unrecovered"] else "无扰动"),
+              delta("settling_time", "{:+.2f} s"), delta_color="inverse")
+    c3.metric("VSG阻尼比评估", f"{zeta:.3f}" if np.isfinite(zeta) else "—", damping_grade(zeta), delta_color="off")
+    summary_caption.caption(f"基于 {summary['runs']} 次已导入运行" + (f"（{summary['failed']} 个文件无法分析）" if summary["failed"] else "")
+                            + (f"，其中 {summary['unrecovered']} 次扰动后频率未恢复（不计入恢复耗时均值）" if summary["unrecovered"] else "")
+                            + ("，增量为当前文件相对均值" if current else ""))
+    with st.expander("各运行指标对比"):
+        table = pd.DataFrame([r for r in runs if "error" not in r]).rename(columns={"run": "运行", "rows": "行数", "event": "有扰动", **METRIC_LABELS})
+        table["运行"] = table["运行"].str[:12]
+        st.dataframe(table, hide_index=True, width="stretch",
+                     column_config={METRIC_LABELS["sag_depth"]: st.column_config.NumberColumn(format="percent")})
+else:
+    for col, label in zip((c1, c2, c3), ("平均电压跌落深度", "频率恢复耗时", "VSG阻尼比评估")):
+        col.metric(label, "—")
+    summary_caption.caption("暂无已导入的仿真运行，上传数据后自动计算。")
+
 st.subheader("数据预览")
-st.dataframe(df, use_container_width=True)
+if result:
+    st.caption(f"共 {result['rows']:,} 行 · {result['row_groups']} 个数据块 · 耗时 {result['seconds']:.2f} s" + ("（已复用历史转换结果）" if result["cached"] else ""))
+    st.dataframe(read_preview(result["path"]), use_container_width=True)
+else:
+    st.info("请上传包含 时间/有功/无功/电压/频率 列的仿真数据文件。")
 
 st.download_button("下载完整仿真实验报告", data="PDF内容占位", file_name="Simulation_Report.pdf")
 
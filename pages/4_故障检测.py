@@ -1,16 +1,60 @@
+import pandas as pd
 import streamlit as st
 from utils.common import set_page_style
+from utils.fault_detector import get_fault_monitor, HEALTH_WEIGHTS
+from utils.perf import timed
 from floating_ai import render_floating_ai
 
 set_page_style()
 
 st.title("故障监测")
-st.success("系统状态：正常运行。构网型算法正在提供惯量支撑。")
-st.json({
-    "实时健康分": 98,
-    "最近故障预警": "无",
-    "直流电压波动": "0.02%",
-    "谐波畸变率": "1.2%"
-})
+
+# 全进程共享的流式检测器：后台线程按 0.1 s 一块持续检测，页面每秒读取一次快照
+monitor = get_fault_monitor()
+
+
+@st.fragment(run_every=1)
+@timed("fault_monitor.render")
+def render_monitor():
+    snapshot = monitor.snapshot()
+    summary = pd.DataFrame(snapshot["summary"])
+    worst = summary.loc[summary["健康分"].idxmin()]
+    alarms = snapshot["alarms"]
+
+    if worst["健康分"] >= 90:
+        st.success("系统状态：正常运行。构网型算法正在提供惯量支撑。")
+    elif worst["健康分"] >= 60:
+        st.warning(f"系统状态：{worst['通道']} 指标异常（健康分 {worst['健康分']:.0f}），请关注。")
+    else:
+        st.error(f"系统状态：{worst['通道']} 出现故障（健康分 {worst['健康分']:.0f}）！")
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("实时健康分", f"{summary['健康分'].mean():.0f}", help="各通道健康分的平均值，扣分权重: " + str(HEALTH_WEIGHTS))
+    col2.metric("最近故障预警", alarms[0]["类型"] if alarms else "无", alarms[0]["通道"] if alarms else None, delta_color="off")
+    col3.metric("直流电压波动", f"{summary['直流偏差(%)'].max():.2f}%")
+    col4.metric("谐波畸变率", f"{summary['THD(%)'].max():.1f}%")
+
+    st.dataframe(summary, hide_index=True, width="stretch",
+                 column_config={"健康分": st.column_config.ProgressColumn("健康分", min_value=0, max_value=100, format="%.0f")})
+
+    col_alarm, col_event = st.columns(2)
+    with col_alarm:
+        st.markdown("#### 🚨 告警记录")
+        if alarms:
+            st.dataframe(pd.DataFrame(alarms), hide_index=True, width="stretch", height=260)
+        else:
+            st.caption("暂无告警")
+    with col_event:
+        st.markdown("#### 📉 暂降 / 暂升事件")
+        if snapshot["events"]:
+            st.dataframe(pd.DataFrame(snapshot["events"]), hide_index=True, width="stretch", height=260)
+        else:
+            st.caption("暂无已结束的事件")
+
+    st.caption(f"已检测 {snapshot['time']:.1f} s 波形 · 采样率 {monitor.detector.fs:.0f} Hz · "
+               f"检测延迟 ≤ {snapshot['latency'] * 1e3:.0f} ms · 单块计算 {snapshot['compute_ms']:.1f} ms")
+
+
+render_monitor()
 
 render_floating_ai()
\ No newline at end of file
@@ -1,27 +1,64 @@
 import streamlit as st
-import numpy as np
 import plotly.graph_objs as go
 from utils.common import set_page_style
+from utils.downsample import plot_xy
+from utils.fault_library import FaultLibrary, FAULT_TYPES, SEVERITIES, MODEL_NAMES, start_background_build
+from utils.render_cache import cached_figure
 from floating_ai import render_floating_ai
 
 set_page_style()
 
+@st.cache_resource
+def get_fault_library():
+    """全进程共享的故障场景库，首次访问时在后台补齐缺失场景，不阻塞页面"""
+    library = FaultLibrary()
+    start_background_build(library)
+    return library
+
+library = get_fault_library()
+
+if 'triggered_fault' not in st.session_state:
+    st.session_state.triggered_fault = ("三相短路", "中等")
+
 st.title("故障触发模拟")
 col_l, col_r = st.columns([1, 2])
 
 with col_l:
     st.write("### 故障控制面板")
-    f_type = st.selectbox("选择故障类型", ["无故障", "三相短路", "直流侧断路", "风速突降"])
+    f_type = st.selectbox("选择故障类型", list(FAULT_TYPES))
+    severity = st.select_slider("故障严重程度", options=SEVERITIES, value="中等")
     if st.button("立即触发表后故障"):
-        st.error(f"检测到 {f_type}！系统进入低电压穿越模式。")
+        st.session_state.triggered_fault = (f_type, severity)
+        if f_type != "无故障":
+            st.error(f"检测到 {f_type}！系统进入低电压穿越模式。")
 
 with col_r:
-    t_f = np.linspace(0, 5, 100)
-    v_f = np.ones(100)
-    v_f[20:40] = 0.4  # 跌落
-    v_f[40:70] = 0.4 + 0.6*(t_f[40:70]-0.4) # 恢复
-    fig_f = go.Figure(go.Scatter(x=t_f, y=v_f, name="电压恢复曲线", line=dict(color='red')))
-    fig_f.update_layout(title="故障恢复能力分析", xaxis_title="时间", yaxis_title="标幺值电压")
-    st.plotly_chart(fig_f, use_container_width=True)
-
-render_floating_ai()
\ No newline at end of file
+    fault, level = st.session_state.triggered_fault
+    # 直接回放场景库中的预计算结果，读取路径上不做任何仿真
+    results = {model: library.load(model, fault, level) for model in MODEL_NAMES}
+    if any(r is None for r in results.values()):
+        st.info("⏳ 故障场景库正在后台预计算，请稍候刷新。")
+    else:
+        colors = {"gfm": "red", "gfl": "orange"}
+
+        def make_voltage_figure(fault, level):
+            fig_f = go.Figure([
+                go.Scatter(**plot_xy(r["t"], r["voltage"], width=800), name=f"{MODEL_NAMES[m]} 并网点电压", line=dict(color=colors[m], dash=None if m == "gfm" else "dash"))
+                for m, r in results.items()
+            ])
+            fig_f.update_layout(title=f"故障恢复能力分析（{fault} · {level}）", xaxis_title="时间(s)", yaxis_title="标幺值电压")
+            return fig_f
+
+        def make_freq_figure(fault, level):
+            fig_hz = go.Figure([
+                go.Scatter(**plot_xy(r["t"], r["freq"], width=800), name=f"{MODEL_NAMES[m]} 频率", line=dict(color=colors[m], dash=None if m == "gfm" else "dash"))
+                for m, r in results.items()
+            ])
+            fig_hz.update_layout(title="故障期间频率响应", xaxis_title="时间(s)", yaxis_title="频率(Hz)")
+            return fig_hz
+
+        # 场景结果只由 (故障类型, 严重程度) 决定，图对象全进程只构建一次
+        st.plotly_chart(cached_figure("fault.voltage", make_voltage_figure, fault, level), use_container_width=True)
+        st.plotly_chart(cached_figure("fault.freq", make_freq_figure, fault, level), use_container_width=True)
+
+render_floating_ai()
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+from utils.common import set_page_style
+from utils.perf import REGISTRY, SamplingProfiler, current_session
+from floating_ai import start_ai_warm_up
+
+set_page_style()
+
+# 配置了 DIAGNOSTICS_TOKEN 时需通过 /diagnostics?token=... 访问
+if "DIAGNOSTICS_TOKEN" in st.secrets and st.query_params.get("token") != st.secrets["DIAGNOSTICS_TOKEN"]:
+    st.error("无权访问性能诊断页。")
+    st.stop()
+
+st.title("性能诊断")
+st.caption("各代码段耗时直方图（进程启动以来），不在导航栏中显示。")
+
+# =========================================================
+# 1. 代码段耗时
+# =========================================================
+scope = st.radio("统计范围", ["全部会话", "当前会话"], horizontal=True)
+rows = REGISTRY.rows(None if scope == "全部会话" else current_session())
+if rows:
+    st.dataframe(pd.DataFrame(rows).round(3), hide_index=True, width="stretch")
+else:
+    st.caption("暂无计时数据，先打开其他页面。")
+
+col_reset, col_export = st.columns(2)
+if col_reset.button("清空统计"):
+    REGISTRY.reset()
+    st.rerun()
+col_export.download_button("导出 Prometheus 文本", REGISTRY.to_prometheus(), file_name="metrics.txt", mime="text/plain")
+
+# =========================================================
+# 2. 组件状态：启动预热、大模型服务、故障监测等
+# =========================================================
+st.subheader("启动预热")
+report = start_ai_warm_up()
+stages = report.rows()
+if stages:
+    st.dataframe(pd.DataFrame(stages, columns=["阶段", "耗时(s)", "状态"]).round(3), hide_index=True, width="stretch")
+st.caption(f"预热{'已完成' if report.done.is_set() else '进行中'}，进程已运行 {time.perf_counter() - report.t0:.0f} 秒")
+
+st.subheader("组件状态")
+components = REGISTRY.collect()
+if components:
+    st.dataframe(pd.DataFrame([{"组件": c, "指标": k, "数值": v} for c, values in components.items() for k, v in values.items()]),
+                 hide_index=True, width="stretch")
+else:
+    st.caption("尚无已启动的后台组件。")
+
+# =========================================================
+# 3. 采样分析：抓取 Streamlit 脚本线程的调用栈
+# =========================================================
+st.subheader("采样分析")
+col_sec, col_btn = st.columns([3, 1])
+seconds = col_sec.slider("采样时长 (s)", 1, 30, 5)
+if col_btn.button("开始采样"):
+    st.session_state.perf_profiler = SamplingProfiler(thread_prefix="ScriptRunner", exclude=[threading.get_ident()]).start(seconds)
+
+profiler = st.session_state.get("perf_profiler")
+if profiler is not None:
+    if not profiler.done.is_set():
+        with st.spinner("正在采样，请在其他页面正常操作..."):
+            profiler.done.wait(seconds + 1)
+    st.caption(f"共 {profiler.samples} 个样本")
+    if profiler.samples:
+        top = pd.DataFrame(profiler.top(30))
+        st.dataframe(top.style.format({"自身占比": "{:.1%}", "累计占比": "{:.1%}"}), hide_index=True, width="stretch")
+        st.download_button("下载折叠栈（火焰图）", profiler.collapsed(), file_name="profile.folded", mime="text/plain")
\ No newline at end of file
@@ -0,0 +1,44 @@
+import numpy as np
+
+from utils.fault_detector import StreamingFaultDetector
+
+FS, F0, BLOCK = 3200.0, 50.0, 320
+
+
+def _blocks(amplitude):
+    """按块切分的正弦波形：amplitude 为每个采样点的有效值 (pu)"""
+    n = np.arange(len(amplitude))
+    ac = np.sqrt(2) * amplitude * np.sin(2 * np.pi * F0 * n / FS)
+    for i in range(0, len(n), BLOCK):
+        k = min(BLOCK, len(n) - i)
+        yield ac[None, i:i + k], np.ones((1, k)), np.full((1, k), F0)
+
+
+def test_clean_sine_is_healthy_from_first_block():
+    detector = StreamingFaultDetector(["A"], fs=FS, f0=F0)
+    detector.update(*next(_blocks(np.ones(BLOCK))))
+    assert detector.health[0] > 99
+    assert not detector.alarms
+
+
+def test_sag_ending_on_block_boundary():
+    detector = StreamingFaultDetector(["A"], fs=FS, f0=F0)
+    detector.update(*next(_blocks(np.ones(BLOCK))))
+    detector._state["电压暂降"][:] = True
+    detector._event_start[:] = 0.05
+    detector._event_extreme[:] = 0.5
+    # 块首一点的有效值已恢复到 1 pu：事件在第 0 个点结束
+    detector._detect_events(np.ones((1, BLOCK)), 0.1 + np.arange(BLOCK) / FS, np.ones(BLOCK, dtype=bool))
+    assert not detector._state["电压暂降"][0]
+    event = detector.events[-1]
+    assert event["类型"] == "电压暂降" and event["持续(ms)"] == 50.0 and event["极值(pu)"] == 0.5
+
+
+def test_sag_event_across_blocks():
+    amplitude = np.ones(10 * BLOCK)
+    amplitude[3 * BLOCK:5 * BLOCK] = 0.5
+    detector = StreamingFaultDetector(["A"], fs=FS, f0=F0)
+    for block in _blocks(amplitude):
+        detector.update(*block)
+    assert [e["类型"] for e in detector.events] == ["电压暂降"]
+    assert abs(detector.events[0]["持续(ms)"] - 200) < 25
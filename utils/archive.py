@@ -0,0 +1,259 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "archive")
+
+# 段内稀疏索引步长：每隔 SPARSE_STRIDE 个点记录一个时间戳，常驻内存
+SPARSE_STRIDE = 4096
+
+# 同一天（UTC）内的新数据并入该通道最后一段，段数与 manifest 条目按天增长；单段超过 MAX_SEGMENT_POINTS 点后另起新段
+ROLL_SECONDS = 86400
+MAX_SEGMENT_POINTS = 1 << 20
+
+
+class Archive:
+    """
+    只追加的遥测列式归档
+    每个通道由若干不可变的段组成，每段两个 .npy（时间 float64 秒 / 数值 float32），以内存映射方式读取；
+    各通道目录下的 manifest.json 记录段的时间范围（段级索引），段内再用稀疏时间戳定位到 4096 点的小块，
+    因此范围查询只触及少数页面，不加载整个文件。
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR, max_open_segments=256):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._open = OrderedDict()
+        self._max_open = max_open_segments
+        self._retired = []
+        self._migrate_manifest()
+        self._index = {}
+        if os.path.isdir(directory):
+            for channel in sorted(os.listdir(directory)):
+                segs = self._load_manifest(channel)
+                if segs:
+                    self._set_segments(channel, segs)
+
+    # ---------- 元数据 ----------
+    def _manifest_path(self, channel):
+        return os.path.join(self.directory, channel, "manifest.json")
+
+    def _load_manifest(self, channel):
+        try:
+            with open(self._manifest_path(channel), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+
+    def _save_manifest(self, channel, segs):
+        path = self._manifest_path(channel)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(segs, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    def _migrate_manifest(self):
+        """旧版把所有通道写在根目录一个 manifest.json 里，拆成按通道的 manifest"""
+        legacy = os.path.join(self.directory, "manifest.json")
+        try:
+            with open(legacy, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        for channel, segs in manifest.items():
+            self._save_manifest(channel, segs)
+        os.remove(legacy)
+
+    def _set_segments(self, channel, segs):
+        # 段列表与时间索引整体替换，读者拿到的总是同一版本的一组
+        self._index[channel] = (
+            np.array([s["t0"] for s in segs], dtype=np.float64),
+            np.array([s["t1"] for s in segs], dtype=np.float64),
+            segs,
+        )
+
+    def channels(self):
+        return list(self._index)
+
+    def time_span(self, channel):
+        entry = self._index.get(channel)
+        if entry is None:
+            return None
+        segs = entry[2]
+        return segs[0]["t0"], segs[-1]["t1"]
+
+    # ---------- 写入 ----------
+    def _seg_path(self, channel, seg_id, kind):
+        return os.path.join(self.directory, channel, f"{seg_id:08d}.{kind}.npy")
+
+    def _drop_retired(self):
+        """删除已被合并段取代的旧段文件；推迟到下一次写入，给仍在读旧 manifest 的读者留出时间"""
+        keep = []
+        for channel, seg_id in self._retired:
+            self._open.pop((channel, seg_id), None)
+            try:
+                for kind in ("t", "v", "idx"):
+                    path = self._seg_path(channel, seg_id, kind)
+                    if os.path.exists(path):
+                        os.remove(path)
+            except OSError:
+                keep.append((channel, seg_id))
+        self._retired = keep
+
+    def append_segment(self, channel, times, values):
+        """写入一个新段（与最后一段同一天时合并为新段），times 须严格递增且晚于该通道已有数据"""
+        times = np.ascontiguousarray(times, dtype=np.float64)
+        values = np.ascontiguousarray(values, dtype=np.float32)
+        if times.ndim != 1 or times.shape != values.shape:
+            raise ValueError("times 与 values 须为等长一维数组")
+        if len(times) == 0:
+            return
+        if len(times) > 1 and not (np.diff(times) > 0).all():
+            raise ValueError("times 须严格递增")
+        with self._lock:
+            segs = self._index[channel][2] if channel in self._index else []
+            if segs and times[0] <= segs[-1]["t1"]:
+                raise ValueError(f"通道 {channel} 只允许追加更晚的数据")
+            self._drop_retired()
+            seg_id = segs[-1]["id"] + 1 if segs else 0
+            last = segs[-1] if segs else None
+            merge = (
+                last is not None
+                and last["t1"] // ROLL_SECONDS == times[0] // ROLL_SECONDS
+                and last["n"] + len(times) <= MAX_SEGMENT_POINTS
+            )
+            if merge:
+                times = np.concatenate([np.load(self._seg_path(channel, last["id"], "t")), times])
+                values = np.concatenate([np.load(self._seg_path(channel, last["id"], "v")), values])
+            os.makedirs(os.path.join(self.directory, channel), exist_ok=True)
+            for kind, arr in (("t", times), ("v", values), ("idx", times[::SPARSE_STRIDE])):
+                path = self._seg_path(channel, seg_id, kind)
+                with open(path + ".tmp", "wb") as f:
+                    np.save(f, arr)
+                os.replace(path + ".tmp", path)
+            # 段文件全部落盘后才更新 manifest，读者看到的总是完整的段
+            entry = {"id": seg_id, "t0": float(times[0]), "t1": float(times[-1]), "n": int(len(times))}
+            segs = segs[:-1] + [entry] if merge else segs + [entry]
+            self._save_manifest(channel, segs)
+            self._set_segments(channel, segs)
+            if merge:
+                self._retired.append((channel, last["id"]))
+
+    # ---------- 读取 ----------
+    def _segment(self, channel, seg_id):
+        key = (channel, seg_id)
+        with self._lock:
+            seg = self._open.get(key)
+            if seg is not None:
+                self._open.move_to_end(key)
+                return seg
+        seg = (
+            np.load(self._seg_path(channel, seg_id, "t"), mmap_mode="r"),
+            np.load(self._seg_path(channel, seg_id, "v"), mmap_mode="r"),
+            np.load(self._seg_path(channel, seg_id, "idx")),
+        )
+        with self._lock:
+            self._open[key] = seg
+            while len(self._open) > self._max_open:
+                self._open.popitem(last=False)
+        return seg
+
+    @staticmethod
+    def _locate(times, sparse, t, side):
+        """先在常驻内存的稀疏索引里定位小块，再在 mmap 的小块内二分"""
+        block = max(int(np.searchsorted(sparse, t, side=side)) - 1, 0)
+        lo = block * SPARSE_STRIDE
+        hi = min(lo + 2 * SPARSE_STRIDE, len(times))
+        return lo + int(np.searchsorted(times[lo:hi], t, side=side))
+
+    def iter_range(self, channel, t0, t1):
+        """逐段产出 [t0, t1] 内的 (times, values) 零拷贝只读视图"""
+        if channel not in self._index:
+            raise KeyError(f"归档中没有通道: {channel}")
+        seg_t0, seg_t1, segs = self._index[channel]
+        first = int(np.searchsorted(seg_t1, t0, side="left"))
+        last = int(np.searchsorted(seg_t0, t1, side="right"))
+        for k in range(first, last):
+            times, values, sparse = self._segment(channel, segs[k]["id"])
+            lo = self._locate(times, sparse, t0, "left") if t0 > segs[k]["t0"] else 0
+            hi = self._locate(times, sparse, t1, "right") if t1 < segs[k]["t1"] else len(times)
+            if hi > lo:
+                yield times[lo:hi], values[lo:hi]
+
+    def read_range(self, channel, t0, t1):
+        """
+        读取 [t0, t1] 内的 (times, values)
+        范围落在单个段内时直接返回 mmap 零拷贝视图；跨段时才拼接成新数组
+        """
+        parts = list(self.iter_range(channel, t0, t1))
+        if not parts:
+            return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+
+class ArchiveWriter:
+    """
+    按通道缓冲实时样本（线程安全），攒满 segment_size 个点或最早一个缓冲点超过 max_age 秒时落成一个段，
+    进程意外退出最多丢失 max_age 秒的数据；时间戳按通道钳制为严格递增，系统时钟回拨时不会整段写入失败
+    """
+
+    def __init__(self, archive, segment_size=3600, max_age=300.0):
+        self.archive = archive
+        self.segment_size = segment_size
+        self.max_age = max_age
+        self._buffers = {}
+        self._last = {}
+        self._opened = {}
+        self._lock = threading.Lock()
+
+    def _clamp(self, channel, t):
+        last = self._last.get(channel)
+        if last is None:
+            span = self.archive.time_span(channel)
+            last = span[1] if span else -np.inf
+        t = max(float(t), float(np.nextafter(last, np.inf)))
+        self._last[channel] = t
+        return t
+
+    def append(self, t, values):
+        """写入一个时刻的多通道数据，values 为 {通道: 数值}"""
+        now = time.monotonic()
+        full = []
+        with self._lock:
+            for channel, v in values.items():
+                buf = self._buffers.setdefault(channel, ([], []))
+                if not buf[0]:
+                    self._opened[channel] = now
+                buf[0].append(self._clamp(channel, t))
+                buf[1].append(v)
+                if len(buf[0]) >= self.segment_size or now - self._opened[channel] >= self.max_age:
+                    full.append((channel, buf))
+                    self._buffers[channel] = ([], [])
+        self._write(full)
+
+    def flush(self):
+        with self._lock:
+            pending = [(c, b) for c, b in self._buffers.items() if b[0]]
+            self._buffers = {}
+        self._write(pending)
+
+    def _write(self, segments):
+        failed = []
+        for channel, (ts, vs) in segments:
+            try:
+                self.archive.append_segment(channel, ts, vs)
+            except Exception as e:
+                failed.append((channel, ts, vs, e))
+        if not failed:
+            return
+        # 写盘失败的段全部放回缓冲区，下次落段时重试；其余通道照常落盘
+        with self._lock:
+            for channel, ts, vs, _ in failed:
+                buf = self._buffers.setdefault(channel, ([], []))
+                buf[0][:0], buf[1][:0] = ts, vs
+        raise failed[0][3]
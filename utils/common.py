@@ -1,8 +1,14 @@
+import time
+
 import streamlit as st
-import requests
+from utils.geo_cache import GeoCache, fetch_and_build
+from utils.perf import start_metrics_exporter, timed
 
+@timed
 def set_page_style():
     """全局 CSS 样式注入"""
+    # 每个进程只执行一次：配置了 PERF_METRICS_PORT 时启动 Prometheus 指标端点
+    start_metrics_exporter()
     st.markdown("""
     <style>
         /* 统一导航栏对齐 */
@@ -24,15 +30,35 @@ def set_page_style():
         .toc-box {
             position: sticky; top: 2rem; padding: 15px; background-color: #f8f9fa; border-left: 4px solid #1e3a8a;
         }
+        /* 性能诊断页不出现在导航栏中，直接访问 /diagnostics */
+        [data-testid="stSidebarNav"] li:has(a[href$="/diagnostics"]) { display: none; }
     </style>
     """, unsafe_allow_html=True)
 
-@st.cache_data
-def load_china_map():
-    """加载中国地图 GeoJSON，带有缓存机制"""
-    url = "https://geo.datav.aliyun.com/areas_v3/bound/100000_full.json"
+GEO_RETRY_SECONDS = 300      # 本地缓存缺失且下载失败后，至少间隔这么久才再次尝试联网
+_geo_failures = {}
+
+@st.cache_resource
+def _open_geo_cache(name):
+    # 打不开时抛异常：st.cache_resource 不缓存异常，联网恢复后仍可重新生成
+    cache = GeoCache.open(name) or fetch_and_build(name)
+    if cache is None:
+        raise FileNotFoundError(f"地图 {name} 无本地缓存且无法下载")
+    return cache
+
+
+def get_geo_cache(name="china"):
+    """本地多级细节地图几何（内存映射）；缓存缺失时联网生成，失败后按 GEO_RETRY_SECONDS 退避重试，期间返回 None"""
+    if time.monotonic() - _geo_failures.get(name, -GEO_RETRY_SECONDS) < GEO_RETRY_SECONDS:
+        return None
     try:
-        response = requests.get(url, timeout=5)
-        return response.json()
-    except:
-        return None
\ No newline at end of file
+        return _open_geo_cache(name)
+    except FileNotFoundError:
+        _geo_failures[name] = time.monotonic()
+        return None
+
+
+def load_china_map():
+    """加载中国地图 GeoJSON（省级）：优先读本地缓存，缺失时联网生成（见 get_geo_cache），都不可用时返回 None"""
+    cache = get_geo_cache("china")
+    return cache.geojson() if cache is not None else None
\ No newline at end of file
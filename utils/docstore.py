@@ -0,0 +1,103 @@
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+DOCSTORE_NAME = "docstore.sqlite3"
+MMAP_BYTES = 1 << 30
+
+
+class SqliteDocstore(Docstore):
+    """
+    只读的 SQLite 文档库：按 id 逐条读取知识块，不像 index.pkl 那样启动时整体反序列化
+    表 docs(pos 索引位置, id, page_content, metadata JSON)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._conn.execute(f"PRAGMA mmap_size = {MMAP_BYTES}")  # 页面由操作系统按需换入
+        self._lock = threading.Lock()
+
+    def search(self, search):
+        with self._lock:
+            row = self._conn.execute("SELECT page_content, metadata FROM docs WHERE id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def id_at(self, pos):
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM docs WHERE pos = ?", (pos,)).fetchone()
+        if row is None:
+            raise KeyError(pos)
+        return row[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+
+class PositionMap(Mapping):
+    """惰性的 index_to_docstore_id：索引位置 -> 知识块 id，按需查询 SQLite"""
+
+    def __init__(self, docstore):
+        self._docstore = docstore
+        self._len = len(docstore)
+
+    def __getitem__(self, pos):
+        return self._docstore.id_at(int(pos))
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return iter(range(self._len))
+
+
+def export_docstore(db, path, batch=10_000):
+    """把向量库的文档与位置映射导出为 SQLite（构建时调用）"""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("CREATE TABLE docs (pos INTEGER PRIMARY KEY, id TEXT UNIQUE, page_content TEXT, metadata TEXT)")
+        rows = []
+        for pos, doc_id in db.index_to_docstore_id.items():
+            doc = db.docstore.search(doc_id)
+            rows.append((pos, doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False)))
+            if len(rows) >= batch:
+                conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?)", rows)
+                rows = []
+        conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_vector_store(index_dir, embeddings):
+    """
+    应用侧加载知识库：有 SQLite 文档库时，检索索引以内存映射只读打开、文档按需读取；
+    旧版索引（只有 index.faiss + index.pkl）退回 FAISS.load_local 整体加载
+    """
+    from langchain_community.vectorstores import FAISS
+    from utils.vector_index import SEARCH_INDEX_NAME, read_search_index
+
+    docstore_path = os.path.join(index_dir, DOCSTORE_NAME)
+    if not os.path.exists(docstore_path):
+        return FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+    try:
+        with open(os.path.join(index_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            params = json.load(f).get("search_params", {})
+    except FileNotFoundError:
+        params = {}
+    index_path = os.path.join(index_dir, SEARCH_INDEX_NAME)
+    if not os.path.exists(index_path):
+        index_path = os.path.join(index_dir, "index.faiss")
+    index = read_search_index(index_path, params)
+    docstore = SqliteDocstore(docstore_path)
+    return FAISS(embeddings, index, docstore, PositionMap(docstore))
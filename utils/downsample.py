@@ -0,0 +1,82 @@
+import numpy as np
+
+# 图表默认像素宽度：每个像素列最多保留 min/max 两个点
+DEFAULT_WIDTH = 1200
+
+
+def _bucket_extrema(y, idx_min, idx_max, factor):
+    """把相邻 factor 个桶合并成一个，返回新的 (min 索引, max 索引)"""
+    m = len(idx_min)
+    pad = (-m) % factor
+    if pad:
+        idx_min = np.concatenate([idx_min, np.repeat(idx_min[-1], pad)])
+        idx_max = np.concatenate([idx_max, np.repeat(idx_max[-1], pad)])
+    idx_min = idx_min.reshape(-1, factor)
+    idx_max = idx_max.reshape(-1, factor)
+    y_min = np.where(np.isnan(y[idx_min]), np.inf, y[idx_min])
+    y_max = np.where(np.isnan(y[idx_max]), -np.inf, y[idx_max])
+    rows = np.arange(len(idx_min))
+    return idx_min[rows, y_min.argmin(axis=1)], idx_max[rows, y_max.argmax(axis=1)]
+
+
+def minmax(x, y, n_buckets):
+    """单层 min/max 降采样：等点数分桶，每桶保留最小、最大两个点（保持时间顺序）"""
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return x, y
+    factor = int(np.ceil(n / n_buckets))
+    idx = np.arange(n)
+    i_min, i_max = _bucket_extrema(y, idx, idx, factor)
+    keep = np.unique(np.concatenate([i_min, i_max, [0, n - 1]]))
+    return x[keep], y[keep]
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets 降采样，保留曲线视觉形状
+    每个桶内的三角形面积计算是向量化的，循环次数只与输出点数有关
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        cx = x[nxt_lo:nxt_hi].mean()
+        cy = y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.nanargmax(area)) if np.isfinite(area).any() else lo
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+def downsample_xy(x, y, width=DEFAULT_WIDTH, x_range=None, method="minmax"):
+    """
+    画图前的统一入口：点数不超过 2 × width 时原样返回
+    method: "minmax"（保峰值，适合故障波形）/ "lttb"（保形状，适合趋势曲线）
+    """
+    y = np.asarray(y)
+    x = np.arange(len(y)) if x is None else np.asarray(x)
+    if x_range is not None:
+        i0 = max(int(np.searchsorted(x, x_range[0], side="left")) - 1, 0)
+        i1 = int(np.searchsorted(x, x_range[1], side="right")) + 1
+        x, y = x[i0:i1], y[i0:i1]
+    if len(y) <= 2 * width:
+        return x, y
+    if method == "lttb":
+        return lttb(x, y, 2 * width)
+    return minmax(x, y, width)
+
+
+def plot_xy(x, y, width=DEFAULT_WIDTH, x_range=None, method="minmax"):
+    """downsample_xy 的 Plotly 便捷形式：go.Scatter(**plot_xy(t, v), ...)"""
+    x, y = downsample_xy(x, y, width=width, x_range=x_range, method=method)
+    return {"x": x, "y": y}
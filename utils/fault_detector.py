@@ -0,0 +1,342 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import streamlit as st
+
+# 判据阈值（电压为标幺值）
+SAG_THRESHOLD = 0.9          # 有效值低于 0.9 pu 为暂降
+SWELL_THRESHOLD = 1.1        # 高于 1.1 pu 为暂升
+HYSTERESIS = 0.02            # 事件结束需越过阈值 2% 的回差
+DC_LIMIT = 0.05              # 直流电压偏差上限 5%
+DC_TIME_CONSTANT = 0.02      # 直流电压滤波时间常数（秒）
+ROCOF_LIMIT = 1.0            # 频率变化率上限（Hz/s）
+ROCOF_WINDOW = 0.1           # ROCOF 差分窗口（秒）
+THD_LIMIT = 0.05             # 电压总谐波畸变率上限 5%
+N_HARMONICS = 13
+
+# 健康分各项扣分权重（满分 100）
+HEALTH_WEIGHTS = {"voltage": 40, "dc": 25, "rocof": 20, "thd": 15}
+
+
+def _hysteresis(enter, release, state0):
+    """
+    向量化滞回状态机：enter / release 为 (C, k) 布尔数组，state0 为 (C,) 块首状态
+    每个时刻的状态 = 截至该时刻最后一次「进入」是否晚于最后一次「退出」，块首状态视为发生在 -1 时刻
+    """
+    idx = np.arange(enter.shape[1])
+    last_enter = np.maximum.accumulate(np.where(enter, idx, -2), axis=1)
+    last_release = np.maximum.accumulate(np.where(release, idx, -2), axis=1)
+    init_enter = np.where(state0, -1, -2)[:, None]
+    init_release = np.where(state0, -2, -1)[:, None]
+    return np.maximum(last_enter, init_enter) > np.maximum(last_release, init_release)
+
+
+class StreamingFaultDetector:
+    """
+    多通道流式故障检测：按块输入，全部计算跨通道向量化，每个采样点的计算量为常数
+      - 一个工频周期窗口的滑动有效值（前缀和差分）与带滞回的暂降 / 暂升事件
+      - 直流电压偏差（指数滑动平均）
+      - ROCOF（窗口差分）
+      - 滑动 DFT 求 1~n_harmonics 次谐波与 THD（块内递推合并为一次矩阵乘，定期用窗口直接重算消除累计误差）
+    告警在越限的那一块内产生，检测延迟不超过 块长 + 一个工频周期。
+    """
+
+    def __init__(self, channels, fs=3200.0, f0=50.0, dc_nominal=1.0, n_harmonics=N_HARMONICS,
+                 resync_blocks=100, max_alarms=500):
+        self.channels = list(channels)
+        self.fs, self.f0 = float(fs), float(f0)
+        self.N = int(round(fs / f0))
+        if n_harmonics >= self.N // 2:
+            raise ValueError("采样率过低，无法计算所需次数的谐波")
+        c = len(self.channels)
+        self.dc_nominal = dc_nominal
+        self.rocof_lag = max(1, int(round(ROCOF_WINDOW * fs)))
+        self.harmonics = np.arange(1, n_harmonics + 1)
+        self.resync_blocks = resync_blocks
+        self.samples = 0
+        self.last_block = 0
+        self._blocks = 0
+
+        # 滑动 DFT：X_h[n] = (X_h[n-1] + x[n] - x[n-N]) · W_h，W_h = e^{j2πh/N}
+        self._twiddle = np.exp(2j * np.pi * self.harmonics / self.N)
+        self._basis = np.exp(-2j * np.pi * np.outer(np.arange(self.N), self.harmonics) / self.N)
+        self._powers = {}
+        self._dc_alpha = 1.0 - np.exp(-1.0 / (DC_TIME_CONSTANT * fs))
+        self._decay = {}
+
+        # 跨块状态
+        self._ac_hist = np.zeros((c, self.N))
+        self._f_hist = np.full((c, self.rocof_lag), self.f0)
+        self._spectrum = np.zeros((c, n_harmonics), dtype=complex)
+        self._dc_ema = np.full(c, float(dc_nominal))
+        self._state = {"电压暂降": np.zeros(c, dtype=bool), "电压暂升": np.zeros(c, dtype=bool)}
+        self._event_start = np.zeros(c)
+        self._event_extreme = np.ones(c)
+        self._over = {name: np.zeros(c, dtype=bool) for name in ("直流电压偏差", "频率变化率", "谐波畸变")}
+
+        # 各通道当前指标
+        self.rms = np.ones(c)
+        self.thd = np.zeros(c)
+        self.dc_dev = np.zeros(c)
+        self.rocof = np.zeros(c)
+        self.health = np.full(c, 100.0)
+        self.alarms = deque(maxlen=max_alarms)
+        self.events = deque(maxlen=max_alarms)
+
+    @property
+    def latency_bound(self):
+        """检测延迟上限（秒）：最近一块的长度 + 一个工频周期"""
+        return (self.last_block + self.N) / self.fs
+
+    def _alarm(self, t, ch, kind, value):
+        self.alarms.append({"时间(s)": round(float(t), 4), "通道": self.channels[ch], "类型": kind, "数值": round(float(value), 4)})
+
+    def _block_powers(self, k):
+        """块内第 m 个点对块末频谱的贡献系数 W^(k-m)，按块长缓存"""
+        powers = self._powers.get(k)
+        if powers is None:
+            powers = self._twiddle[None, :] ** np.arange(k, 0, -1)[:, None]
+            powers = self._powers[k] = np.hstack([powers.real, powers.imag])     # 实数矩阵乘比复数快一倍
+        return powers
+
+    def _block_decay(self, k):
+        decay = self._decay.get(k)
+        if decay is None:
+            decay = self._decay[k] = self._dc_alpha * (1.0 - self._dc_alpha) ** np.arange(k - 1, -1, -1)
+        return decay
+
+    def _detect_events(self, rms, times, primed):
+        # (事件, 本块是否可能进入, 进入条件, 退出条件, 极值函数)
+        rules = (
+            ("电压暂降", rms.min(axis=1) < SAG_THRESHOLD,
+             lambda r: (r < SAG_THRESHOLD) & primed, lambda r: r > SAG_THRESHOLD + HYSTERESIS, np.minimum),
+            ("电压暂升", rms.max(axis=1) > SWELL_THRESHOLD,
+             lambda r: (r > SWELL_THRESHOLD) & primed, lambda r: r < SWELL_THRESHOLD - HYSTERESIS, np.maximum),
+        )
+        for name, candidate, enter, release, extreme in rules:
+            # 只有事件进行中或本块越过阈值的通道才需要跑状态机，正常通道整块跳过
+            rows = np.flatnonzero(self._state[name] | candidate)
+            if len(rows) == 0:
+                continue
+            r = rms[rows]
+            prev = self._state[name][rows]
+            state = _hysteresis(enter(r), release(r), prev)
+            self._state[name][rows] = state[:, -1]
+            edges = np.diff(np.concatenate([prev[:, None], state], axis=1).astype(np.int8), axis=1)
+            # 有跳变的通道逐段处理（开始 -> 更新极值 -> 结束），其余通道不走 Python 循环
+            for i in np.flatnonzero(edges.any(axis=1)):
+                ch = rows[i]
+                starts = np.flatnonzero(edges[i] == 1)
+                ends = np.flatnonzero(edges[i] == -1)
+                seg_starts = np.r_[0, starts] if prev[i] else starts
+                seg_ends = np.r_[ends, len(times)] if state[i, -1] else ends
+                for s, e in zip(seg_starts, seg_ends):
+                    if edges[i, s] == 1:
+                        self._event_start[ch] = times[s]
+                        self._event_extreme[ch] = r[i, s]
+                        self._alarm(times[s], ch, name, r[i, s])
+                    # 事件恰在块首结束时（s == e）本块没有事件内的点，不更新极值
+                    if e > s:
+                        self._event_extreme[ch] = extreme(self._event_extreme[ch], extreme.reduce(r[i, s:e]))
+                    if e < len(times):
+                        self.events.append({"通道": self.channels[ch], "类型": name,
+                                            "开始(s)": round(float(self._event_start[ch]), 4),
+                                            "持续(ms)": round(float(times[e] - self._event_start[ch]) * 1e3, 1),
+                                            "极值(pu)": round(float(self._event_extreme[ch]), 3)})
+            # 整块都处于事件中的通道：只更新极值
+            through = state.all(axis=1) & ~edges.any(axis=1)
+            if through.any():
+                ch = rows[through]
+                self._event_extreme[ch] = extreme(self._event_extreme[ch], extreme.reduce(r[through], axis=1))
+
+    def update(self, ac, dc, freq, t0=None):
+        """
+        输入一块数据：ac 交流电压瞬时值 (pu)、dc 直流电压 (pu)、freq 频率 (Hz)，形状均为 (通道数, k)
+        t0 为块首时刻（秒），默认按累计采样点数推算；返回本块新增的告警
+        """
+        ac = np.atleast_2d(np.asarray(ac, dtype=float))
+        dc = np.atleast_2d(np.asarray(dc, dtype=float))
+        freq = np.atleast_2d(np.asarray(freq, dtype=float))
+        c, k = ac.shape
+        if k == 0:
+            return []
+        t0 = self.samples / self.fs if t0 is None else t0
+        times = t0 + np.arange(k) / self.fs
+        n_alarms = len(self.alarms)
+
+        # --- 滑动有效值：一个周期窗口的平方和 = 前缀和之差 ---
+        ext = np.concatenate([self._ac_hist, ac], axis=1)
+        cs = np.cumsum(ext * ext, axis=1)
+        rms = np.sqrt(np.maximum(cs[:, self.N:] - cs[:, :k], 0.0) / self.N)
+        primed = self.samples + np.arange(k) >= self.N - 1       # 首个周期窗口未填满前不判
+        self._detect_events(rms, times, primed)
+
+        # --- 谐波与 THD ---
+        if self._blocks % self.resync_blocks == 0:
+            self._spectrum = ext[:, -self.N:] @ self._basis
+        else:
+            # X_end = X_0 · W^k + Σ_m (x[m] - x[m-N]) · W^(k-m)
+            acc = (ac - ext[:, :k]) @ self._block_powers(k)
+            h = len(self.harmonics)
+            self._spectrum = self._spectrum * self._twiddle ** k + (acc[:, :h] + 1j * acc[:, h:])
+        mag = np.abs(self._spectrum)
+        self.thd = np.sqrt((mag[:, 1:] ** 2).sum(axis=1)) / np.maximum(mag[:, 0], 1e-9)
+
+        # --- 直流电压偏差：逐点 EMA 的块内闭式解 ---
+        self._dc_ema = self._dc_ema * (1.0 - self._dc_alpha) ** k + dc @ self._block_decay(k)
+        self.dc_dev = np.abs(self._dc_ema - self.dc_nominal) / self.dc_nominal
+
+        # --- ROCOF：取块内绝对值最大的窗口差分 ---
+        f_ext = np.concatenate([self._f_hist, freq], axis=1)
+        rocof = (f_ext[:, self.rocof_lag:] - f_ext[:, :k]) * (self.fs / self.rocof_lag)
+        self.rocof = np.take_along_axis(rocof, np.abs(rocof).argmax(axis=1)[:, None], axis=1)[:, 0]
+
+        # --- 越限告警：由正常变为越限时告警一次 ---
+        for name, value, limit in (("直流电压偏差", self.dc_dev, DC_LIMIT),
+                                   ("频率变化率", np.abs(self.rocof), ROCOF_LIMIT),
+                                   ("谐波畸变", self.thd, THD_LIMIT)):
+            over = value > limit
+            for ch in np.flatnonzero(over & ~self._over[name]):
+                self._alarm(times[-1], ch, name, value[ch])
+            self._over[name] = over
+
+        # --- 健康分：100 减去各项按限值归一化后的加权扣分（电压只看窗口已填满的点） ---
+        self.rms = rms[:, -1]
+        rms_min = rms[:, primed].min(axis=1) if primed.any() else np.ones(c)
+        self.health = 100.0 - (
+            HEALTH_WEIGHTS["voltage"] * np.clip(np.abs(rms_min - 1.0) / (1.0 - SAG_THRESHOLD), 0, 1)
+            + HEALTH_WEIGHTS["dc"] * np.clip(self.dc_dev / DC_LIMIT, 0, 1)
+            + HEALTH_WEIGHTS["rocof"] * np.clip(np.abs(self.rocof) / ROCOF_LIMIT, 0, 1)
+            + HEALTH_WEIGHTS["thd"] * np.clip(self.thd / THD_LIMIT, 0, 1)
+        )
+
+        self._ac_hist = ext[:, -self.N:]
+        self._f_hist = f_ext[:, -self.rocof_lag:]
+        self.samples += k
+        self.last_block = k
+        self._blocks += 1
+        return list(self.alarms)[n_alarms:] if len(self.alarms) > n_alarms else []
+
+    def summary(self):
+        """各通道当前指标（列 -> 数组），可直接交给 st.dataframe"""
+        return {
+            "通道": self.channels,
+            "健康分": np.round(self.health, 1),
+            "电压有效值(pu)": np.round(self.rms, 3),
+            "THD(%)": np.round(self.thd * 100, 2),
+            "直流偏差(%)": np.round(self.dc_dev * 100, 2),
+            "ROCOF(Hz/s)": np.round(self.rocof, 3),
+        }
+
+
+# =========================================================
+# 进程级监测：后台线程持续喂数据，各会话只读取快照
+# =========================================================
+class FaultMonitor:
+    """与 TelemetryStore 相同的模式：唯一的后台线程按块生成 / 接收波形并驱动检测器"""
+
+    def __init__(self, detector, source, block_seconds=0.1):
+        self.detector = detector
+        self.block = max(1, int(round(block_seconds * detector.fs)))
+        self.block_seconds = self.block / detector.fs
+        self.compute_ms = 0.0
+        self._source = source
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                ac, dc, freq = self._source(self.detector.samples, self.block)
+                t = time.perf_counter()
+                with self._lock:
+                    self.detector.update(ac, dc, freq)
+                self.compute_ms = (time.perf_counter() - t) * 1e3
+            except Exception as e:
+                print(f"故障检测线程异常: {e}")
+            next_tick += self.block_seconds
+            self._stop.wait(max(0.0, next_tick - time.monotonic()))
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="fault-monitor", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self, n_alarms=50):
+        with self._lock:
+            d = self.detector
+            return {
+                "time": d.samples / d.fs,
+                "summary": d.summary(),
+                "alarms": list(d.alarms)[::-1][:n_alarms],
+                "events": list(d.events)[::-1][:n_alarms],
+                "latency": d.latency_bound,
+                "compute_ms": self.compute_ms,
+            }
+
+
+def make_demo_waveform_source(n_channels, fs, f0=50.0, seed=None):
+    """
+    演示波形源：各通道为工频正弦叠加少量 5/7 次谐波与噪声，
+    随机在某个通道注入持续数个周期的电压暂降、谐波放大或频率 / 直流电压扰动
+    """
+    rng = np.random.default_rng(seed)
+    phase = rng.uniform(0, 2 * np.pi, (n_channels, 1))
+    h5 = rng.uniform(0.005, 0.015, (n_channels, 1))
+    faults = []   # [通道, 类型, 开始点, 结束点, 强度]
+
+    def source(start, k):
+        n = start + np.arange(k)
+        t = n / fs
+        if rng.random() < 0.01:
+            kind = rng.choice(["sag", "harmonic", "frequency", "dc"])
+            length = int(fs * rng.uniform(0.06, 0.4))
+            faults.append((int(rng.integers(n_channels)), kind, start + int(rng.integers(k)), length, rng.uniform(0.3, 0.8)))
+        amp = np.ones((n_channels, k))
+        harm = np.repeat(h5, k, axis=1)
+        freq = f0 + 0.02 * np.sin(2 * np.pi * 0.05 * t + phase) + 0.0005 * rng.standard_normal((n_channels, k))
+        dc = 1.0 + 0.002 * rng.standard_normal((n_channels, k))
+        for ch, kind, s, length, depth in faults:
+            active = (n >= s) & (n < s + length)
+            if kind == "sag":
+                amp[ch, active] = 1.0 - depth
+            elif kind == "harmonic":
+                harm[ch, active] = 0.1 * depth
+            elif kind == "frequency":
+                freq[ch] += np.clip((n - s) / length, 0, 1) * depth * 0.5 * (n < s + 2 * length)
+            else:
+                dc[ch, active] += 0.12 * depth
+        faults[:] = [f for f in faults if f[2] + 2 * f[3] > start + k]
+        w = 2 * np.pi * f0 * t
+        ac = np.sqrt(2) * (amp * np.sin(w + phase) + harm * np.sin(5 * (w + phase)) + 0.5 * harm * np.sin(7 * (w + phase)))
+        ac += 0.003 * rng.standard_normal((n_channels, k))
+        return ac, dc, freq
+
+    return source
+
+
+@st.cache_resource
+def get_fault_monitor(fs=3200.0, block_seconds=0.1):
+    """全进程共享的故障监测（通道取拓扑中的可见节点，首次调用时启动后台线程）"""
+    from utils.topology import load_topology
+
+    topology = load_topology()
+    channels = [node["name"] for node in topology.nodes if node.get("kind") != "junction"]
+    from utils.perf import REGISTRY
+
+    detector = StreamingFaultDetector(channels, fs=fs)
+    monitor = FaultMonitor(detector, make_demo_waveform_source(len(channels), fs), block_seconds)
+    REGISTRY.add_collector("fault_monitor", lambda: {
+        "channels": len(channels), "compute_ms": monitor.compute_ms, "latency_ms": detector.latency_bound * 1e3,
+        "alarms": len(detector.alarms), "min_health": detector.health.min(),
+    })
+    return monitor.start()
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.grid_sim import DEFAULT_PARAMS, make_params, simulate
+
+LIBRARY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scenario_cache")
+LIBRARY_VERSION = 2
+
+# 仿真设置（变化时键值随之变化，旧结果自然失效）
+SIM_SETTINGS = {"t_end": 5.0, "dt": 1e-3, "decimate": 10}
+CHANNELS = ["t", "freq", "grid_freq", "power", "voltage"]
+
+SEVERITIES = ["轻微", "中等", "严重"]
+
+# 故障类型 -> 各严重程度对应的 grid_sim 参数
+FAULT_TYPES = {
+    "无故障": {s: {} for s in SEVERITIES},
+    "三相短路": {
+        "轻微": {"v_dip": 0.3, "dip_duration": 0.10},
+        "中等": {"v_dip": 0.6, "dip_duration": 0.15},
+        "严重": {"v_dip": 0.8, "dip_duration": 0.20},
+    },
+    # 直流侧断路：部分或全部换流器闭锁（单极 / 双极），出力与内电势一并消失，闭锁结束后重启恢复
+    "直流侧断路": {
+        "轻微": {"dc_block": 0.25, "block_duration": 0.2},
+        "中等": {"dc_block": 0.5, "block_duration": 0.3},
+        "严重": {"dc_block": 1.0, "block_duration": 0.5},
+    },
+    # 风速突降：换流器仍正常运行，只是有功指令持续下调
+    "风速突降": {
+        "轻微": {"pref_step": -0.1},
+        "中等": {"pref_step": -0.25},
+        "严重": {"pref_step": -0.4},
+    },
+}
+MODEL_NAMES = {"gfm": "构网型 VSG", "gfl": "跟网型 PLL"}
+
+
+def scenario_params(fault, severity):
+    """故障场景的完整参数（在默认工况上叠加故障参数，不含负荷阶跃）"""
+    return {"t_event": 1.0, "load_step": 0.0, **FAULT_TYPES[fault][severity]}
+
+
+def scenario_key(model, fault, severity):
+    """参数哈希：模型 + 完整参数 + 仿真设置 + 版本号"""
+    params = make_params(1, **scenario_params(fault, severity))
+    payload = {
+        "model": model,
+        "params": {k: float(v[0]) for k, v in sorted(params.items())},
+        "sim": SIM_SETTINGS,
+        "version": LIBRARY_VERSION,
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class _ByteLRU:
+    """按字节数限制容量的 LRU（线程安全），用于缓存已加载的场景数组"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._items:
+                self._bytes -= self._items.pop(key).nbytes
+            self._items[key] = value
+            self._bytes += value.nbytes
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self._bytes -= old.nbytes
+
+
+class FaultLibrary:
+    """
+    故障场景库：每个 (模型, 故障类型, 严重程度) 只仿真一次，
+    以 float32 二维数组 (通道数 × 时间点) 存为 <参数哈希>.npy；
+    读取时内存映射并经有界 LRU 缓存，点击故障即可直接回放
+    """
+
+    def __init__(self, directory=LIBRARY_DIR, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self._cache = _ByteLRU(max_bytes)
+        self._build_lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def missing(self):
+        """尚未入库的场景列表 [(model, fault, severity), ...]，参数相同的场景只保留一个"""
+        todo = {}
+        for model in MODEL_NAMES:
+            for fault in FAULT_TYPES:
+                for severity in SEVERITIES:
+                    key = scenario_key(model, fault, severity)
+                    if key not in todo and not os.path.exists(self._path(key)):
+                        todo[key] = (model, fault, severity)
+        return list(todo.values())
+
+    def build(self):
+        """补齐缺失场景：同一模型的所有缺失场景合并成一个批次仿真，返回新增数量"""
+        with self._build_lock:
+            todo = self.missing()
+            os.makedirs(self.directory, exist_ok=True)
+            for model in MODEL_NAMES:
+                batch = [(f, s) for m, f, s in todo if m == model]
+                if not batch:
+                    continue
+                columns = {}
+                for i, (fault, severity) in enumerate(batch):
+                    for k, v in scenario_params(fault, severity).items():
+                        columns.setdefault(k, np.full(len(batch), DEFAULT_PARAMS[k]))[i] = v
+                params = make_params(len(batch), **columns)
+                result = simulate(model, params, **SIM_SETTINGS)
+                for i, (fault, severity) in enumerate(batch):
+                    rows = [result["t"]] + [result[ch][i] for ch in CHANNELS[1:]]
+                    self._save(scenario_key(model, fault, severity), np.vstack(rows).astype(np.float32))
+            return len(todo)
+
+    def _save(self, key, array):
+        # 先写临时文件再原子替换，读者不会看到半写入的文件
+        tmp = self._path(key) + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, self._path(key))
+
+    def load(self, model, fault, severity):
+        """
+        读取场景结果 {通道: 一维数组}
+        不在库中时返回 None（由调用方决定是否触发 build），不会在读取路径上同步仿真
+        """
+        key = scenario_key(model, fault, severity)
+        array = self._cache.get(key)
+        if array is None:
+            path = self._path(key)
+            if not os.path.exists(path):
+                return None
+            array = np.load(path, mmap_mode="r")
+            self._cache.put(key, array)
+        return dict(zip(CHANNELS, array))
+
+
+def start_background_build(library):
+    """后台线程补齐场景库，返回线程对象（库已完整时不启动）"""
+    if not library.missing():
+        return None
+    thread = threading.Thread(target=library.build, name="fault-library-build", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    n = FaultLibrary().build()
+    print(f"场景库已更新，新增 {n} 个场景，目录: {LIBRARY_DIR}")
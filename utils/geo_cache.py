@@ -0,0 +1,245 @@
+import json
+import os
+import shutil
+import sys
+import threading
+
+import numpy as np
+
+GEO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "geo")
+
+# 可缓存的地图及其在线来源（仅在本地缓存缺失时使用一次）
+GEO_SOURCES = {
+    "china": "https://geo.datav.aliyun.com/areas_v3/bound/100000_full.json",
+    "guangdong": "https://geo.datav.aliyun.com/areas_v3/bound/440000_full.json",
+}
+
+# 缩放级别 -> 简化容差（度）：0 级约为全国视图下一个像素，之后每级减半，MAX_LEVEL 及以上为原始精度
+BASE_TOLERANCE = 0.05
+MAX_LEVEL = 8
+
+
+def level_tolerance(zoom):
+    level = int(np.clip(np.floor(zoom), 0, MAX_LEVEL))
+    return level, (0.0 if level >= MAX_LEVEL else BASE_TOLERANCE / 2 ** level)
+
+
+# =========================================================
+# 构建：按共享边界切分弧段，逐弧计算 Douglas-Peucker 重要度
+# =========================================================
+def _dp_importance(pts):
+    """
+    弧段上每个点的重要度 = Douglas-Peucker 恰好删去该点的容差（端点为 inf）
+    子段的重要度不超过父段，因此「保留重要度 ≥ tol 的点」正好等于容差为 tol 的 DP 简化结果
+    """
+    n = len(pts)
+    imp = np.zeros(n)
+    imp[0] = imp[-1] = np.inf
+    stack = [(0, n - 1, np.inf)]
+    while stack:
+        a, b, cap = stack.pop()
+        if b - a < 2:
+            continue
+        p, q = pts[a], pts[b]
+        seg = pts[a + 1:b]
+        d = q - p
+        length = np.hypot(d[0], d[1])
+        if length == 0:
+            dist = np.hypot(seg[:, 0] - p[0], seg[:, 1] - p[1])
+        else:
+            dist = np.abs(d[0] * (seg[:, 1] - p[1]) - d[1] * (seg[:, 0] - p[0])) / length
+        i = a + 1 + int(np.argmax(dist))
+        v = min(float(dist[i - a - 1]), cap)
+        imp[i] = v
+        stack.append((a, i, v))
+        stack.append((i, b, v))
+    return imp
+
+
+def _arc_importance(pts, cache):
+    """相同的弧（含反向）只计算一次，保证相邻区域共享边界简化结果完全一致"""
+    forward = tuple(map(tuple, pts[[0, -1]])) <= tuple(map(tuple, pts[[-1, 0]]))
+    canon = pts if forward else pts[::-1]
+    key = canon.tobytes()
+    imp = cache.get(key)
+    if imp is None:
+        imp = cache[key] = _dp_importance(canon)
+    return imp if forward else imp[::-1]
+
+
+def _ring_importance(ring, members, arc_cache):
+    """
+    环上成员关系（该顶点属于哪些环）发生变化的点是弧段端点，固定保留；
+    不与其他区域相邻的环以首点与距其最远点为端点
+    """
+    n = len(ring) - 1                      # 去掉闭合重复点
+    pts = ring[:n]
+    keys = [members[tuple(p)] for p in pts]
+    fixed = [i for i in range(n) if keys[i] != keys[i - 1] or keys[i] != keys[(i + 1) % n]]
+    if not fixed:
+        far = int(np.argmax(np.hypot(*(pts - pts[0]).T)))
+        fixed = sorted({0, far})
+    imp = np.zeros(n)
+    for j, start in enumerate(fixed):
+        end = fixed[(j + 1) % len(fixed)]
+        idx = np.arange(start, end + 1) if end > start else np.r_[np.arange(start, n), np.arange(0, end + 1)]
+        imp[idx] = np.maximum(imp[idx], _arc_importance(pts[idx], arc_cache))
+    # 每个环至少保留 3 个点，粗级别下也不会整块消失；只补选本环独有的点，不破坏共享边界的一致性
+    need = 3 - int(np.isinf(imp).sum())
+    if need > 0:
+        own = np.array([len(k) == 1 and not np.isinf(imp[i]) for i, k in enumerate(keys)])
+        candidates = np.flatnonzero(own)
+        imp[candidates[np.argsort(-imp[candidates])[:need]]] = np.inf
+    return np.r_[imp, imp[0]]
+
+
+def _polygons(geometry):
+    if geometry is None:
+        return []
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry["type"] == "MultiPolygon":
+        return geometry["coordinates"]
+    return []
+
+
+def build_geo_cache(geojson, out_dir):
+    """
+    把 GeoJSON（Polygon / MultiPolygon 要素）编译为紧凑的多级细节缓存：
+      coords.npy      float32 (N, 2) 全部顶点
+      importance.npy  float32 (N,)   顶点重要度（简化容差）
+      rings.npy / polygons.npy / features.npy  三级 CSR 偏移
+      bbox.npy        float32 (R, 4) 每个环的外包框，粗级别下丢弃小于容差的岛屿和洞
+      properties.json 要素属性
+    """
+    features = geojson["features"]
+    rings, ring_polys, poly_feats = [], [], []
+    for f in features:
+        for poly in _polygons(f.get("geometry")):
+            for ring in poly:
+                ring = np.asarray(ring, dtype=np.float64)[:, :2]
+                if len(ring) < 4:
+                    continue
+                if not np.array_equal(ring[0], ring[-1]):
+                    ring = np.vstack([ring, ring[:1]])
+                rings.append(ring)
+            ring_polys.append(len(rings))
+        poly_feats.append(len(ring_polys))
+
+    members = {}
+    for r, ring in enumerate(rings):
+        for p in map(tuple, ring[:-1]):
+            members.setdefault(p, set()).add(r)
+    members = {p: frozenset(s) for p, s in members.items()}
+
+    arc_cache = {}
+    importance = [_ring_importance(ring, members, arc_cache) for ring in rings]
+    ring_offsets = np.r_[0, np.cumsum([len(r) for r in rings])].astype(np.int64)
+
+    os.makedirs(out_dir, exist_ok=True)
+    arrays = {
+        "coords": np.vstack(rings).astype(np.float32) if rings else np.zeros((0, 2), np.float32),
+        "importance": np.concatenate(importance).astype(np.float32) if rings else np.zeros(0, np.float32),
+        "rings": ring_offsets,
+        "polygons": np.r_[0, ring_polys].astype(np.int64),
+        "features": np.r_[0, poly_feats].astype(np.int64),
+        "bbox": np.array([[*r.min(axis=0), *r.max(axis=0)] for r in rings], dtype=np.float32).reshape(-1, 4),
+    }
+    for name, arr in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), arr)
+    with open(os.path.join(out_dir, "properties.json"), "w", encoding="utf-8") as f:
+        json.dump([feat.get("properties", {}) for feat in features], f, ensure_ascii=False)
+    return {"features": len(features), "rings": len(rings), "vertices": int(ring_offsets[-1])}
+
+
+# =========================================================
+# 读取：内存映射 + 按缩放级别输出 GeoJSON
+# =========================================================
+class GeoCache:
+    """内存映射的多级细节地图几何，geojson(zoom) 按级别简化并缓存结果"""
+
+    def __init__(self, directory):
+        load = lambda name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+        self.coords, self.importance = load("coords"), load("importance")
+        self.rings, self.polygons, self.features = load("rings"), load("polygons"), load("features")
+        self.bbox = load("bbox")
+        with open(os.path.join(directory, "properties.json"), "r", encoding="utf-8") as f:
+            self.properties = json.load(f)
+        self._levels = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, name, geo_dir=GEO_DIR):
+        directory = os.path.join(geo_dir, name)
+        if not os.path.exists(os.path.join(directory, "properties.json")):
+            return None
+        return cls(directory)
+
+    def vertex_count(self, zoom):
+        _, tol = level_tolerance(zoom)
+        return int((np.asarray(self.importance) >= tol).sum())
+
+    def geojson(self, zoom=0):
+        level, tol = level_tolerance(zoom)
+        with self._lock:
+            cached = self._levels.get(level)
+        if cached is not None:
+            return cached
+        keep = np.asarray(self.importance) >= tol
+        size = np.asarray(self.bbox[:, 2:] - self.bbox[:, :2]).max(axis=1)
+        features = []
+        for fi, props in enumerate(self.properties):
+            polys = []
+            for pi in range(self.features[fi], self.features[fi + 1]):
+                rings = []
+                for ri in range(self.polygons[pi], self.polygons[pi + 1]):
+                    is_outer = ri == self.polygons[pi]
+                    if not is_outer and size[ri] < tol:
+                        continue            # 粗级别下丢弃小洞
+                    lo, hi = self.rings[ri], self.rings[ri + 1]
+                    pts = self.coords[lo:hi][keep[lo:hi]]
+                    if len(pts) < 4:
+                        if is_outer:
+                            break
+                        continue
+                    rings.append(np.round(pts.astype(np.float64), 5).tolist())
+                if rings and (size[self.polygons[pi]] >= tol or pi == self.features[fi]):
+                    polys.append(rings)     # 粗级别下丢弃小岛（每个要素至少保留第一个多边形）
+            features.append({"type": "Feature", "properties": props,
+                             "geometry": {"type": "MultiPolygon", "coordinates": polys}})
+        result = {"type": "FeatureCollection", "features": features}
+        with self._lock:
+            self._levels[level] = result
+        return result
+
+
+def fetch_and_build(name, geo_dir=GEO_DIR, timeout=3):
+    """从在线来源下载一次并写入本地缓存；离线、响应不是合法 GeoJSON 或编译失败时返回 None"""
+    import requests
+
+    target = os.path.join(geo_dir, name)
+    tmp = target + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    try:
+        response = requests.get(GEO_SOURCES[name], timeout=timeout)
+        response.raise_for_status()
+        build_geo_cache(response.json(), tmp)
+    except Exception as e:
+        shutil.rmtree(tmp, ignore_errors=True)
+        print(f"地图 {name} 本地缓存缺失且无法下载: {e}")
+        return None
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    return GeoCache.open(name, geo_dir)
+
+
+if __name__ == "__main__":
+    # 用法：python -m utils.geo_cache <名称> [<GeoJSON 文件>]   未给文件时从 GEO_SOURCES 下载
+    name = sys.argv[1]
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], "r", encoding="utf-8") as f:
+            stats = build_geo_cache(json.load(f), os.path.join(GEO_DIR, name))
+        print(f"已生成 {name}: {stats}")
+    else:
+        cache = fetch_and_build(name)
+        print(f"已生成 {name}" if cache else "生成失败")
@@ -0,0 +1,214 @@
+import itertools
+
+import numpy as np
+
+F_NOMINAL = 50.0
+OMEGA_BASE = 2 * np.pi * F_NOMINAL
+
+# 标幺参数（以换流器容量为基准）
+DEFAULT_PARAMS = {
+    # 构网型 VSG
+    "H": 5.0,           # 虚拟惯量时间常数 s
+    "D": 20.0,          # 阻尼系数（相对电网频率）
+    "Dp": 20.0,         # 一次调频下垂系数
+    "E": 1.05,          # 内电势幅值
+    "X_f": 0.15,        # 滤波/变压器电抗
+    # 跟网型 PLL
+    "Kp_pll": 60.0,     # PLL 比例增益 (rad/s)/pu
+    "Ki_pll": 1400.0,   # PLL 积分增益
+    "I_max": 1.2,       # 电流限幅
+    # 公共：弱电网与工况
+    "SCR": 2.5,         # 短路比，电网等值电抗 X_g = 1 / SCR
+    "H_grid": 3.0,      # 受端电网等值惯量 s
+    "D_grid": 1.0,      # 受端电网负荷阻尼
+    "K_gov": 20.0,      # 受端电网一次调频增益（调差系数倒数）
+    "T_gov": 1.5,       # 调速器时间常数 s
+    "V_grid": 1.0,      # 电网电压
+    "P_ref": 0.8,       # 有功指令
+    # 扰动事件
+    "t_event": 1.0,     # 扰动时刻 s
+    "load_step": 0.1,   # 负荷阶跃（正为增负荷）
+    "v_dip": 0.0,       # 电网电压跌落比例（0~1）
+    "dip_duration": 0.0,  # 电压跌落持续时间 s
+    "pref_step": 0.0,   # 有功指令阶跃（如风速突降为负）
+    "dc_block": 0.0,    # 直流侧断路闭锁的换流器比例（0~1）
+    "block_duration": 0.0,  # 闭锁持续时间 s，之后重启恢复
+}
+
+
+def make_params(n=None, **overrides):
+    """
+    组装批量参数：每个参数广播成长度为 n 的一维数组
+    overrides 可以是标量或数组；n 缺省时取数组参数的公共长度
+    """
+    params = {**DEFAULT_PARAMS, **overrides}
+    unknown = set(overrides) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise KeyError(f"未知仿真参数: {sorted(unknown)}")
+    arrays = {k: np.atleast_1d(np.asarray(v, dtype=float)) for k, v in params.items()}
+    size = n or max(len(v) for v in arrays.values())
+    return {k: np.broadcast_to(v, (size,)).copy() for k, v in arrays.items()}
+
+
+def sweep_params(**grids):
+    """参数网格的笛卡尔积，返回 (参数 dict, 组合列表)，便于批量扫描"""
+    names = list(grids)
+    combos = list(itertools.product(*[np.atleast_1d(grids[k]) for k in names]))
+    columns = {k: np.array([c[i] for c in combos], dtype=float) for i, k in enumerate(names)}
+    return make_params(len(combos), **columns), combos
+
+
+def _disturbances(p, t):
+    """t 时刻各场景的电网电压、负荷扰动与有功指令"""
+    after = t >= p["t_event"]
+    in_dip = after & (t < p["t_event"] + p["dip_duration"])
+    v_grid = p["V_grid"] * np.where(in_dip, 1.0 - p["v_dip"], 1.0)
+    d_load = np.where(after, p["load_step"], 0.0)
+    p_ref = p["P_ref"] + np.where(after, p["pref_step"], 0.0)
+    return v_grid, d_load, p_ref
+
+
+def _available(p, t):
+    """t 时刻换流器可用比例：直流侧断路期间被闭锁的部分既不输出功率也不建立电压"""
+    blocked = (t >= p["t_event"]) & (t < p["t_event"] + p["block_duration"])
+    return np.where(blocked, 1.0 - p["dc_block"], 1.0)
+
+
+def _integrate(deriv, outputs, x0, p, t_end, dt, decimate):
+    """批量定步长 RK4，x 形状 (状态数, 场景数)，每 decimate 步记录一次输出"""
+    steps = int(round(t_end / dt))
+    n_out = steps // decimate + 1
+    x = x0
+    record = {k: np.empty((n_out, x.shape[1])) for k in outputs(x, p, 0.0)}
+    t_out = np.empty(n_out)
+
+    def store(j, t, x):
+        t_out[j] = t
+        for k, v in outputs(x, p, t).items():
+            record[k][j] = v
+
+    store(0, 0.0, x)
+    for i in range(steps):
+        t = i * dt
+        k1 = deriv(x, p, t)
+        k2 = deriv(x + 0.5 * dt * k1, p, t + 0.5 * dt)
+        k3 = deriv(x + 0.5 * dt * k2, p, t + 0.5 * dt)
+        k4 = deriv(x + dt * k3, p, t + dt)
+        x = x + dt / 6.0 * (k1 + 2 * k2 + 2 * k3 + k4)
+        if (i + 1) % decimate == 0:
+            store((i + 1) // decimate, (i + 1) * dt, x)
+
+    # 各量输出为 (场景数, 时间点数)
+    return {"t": t_out, **{k: v.T for k, v in record.items()}}
+
+
+def _grid_deriv(p_conv, d_load, dw_g, p_gov, p):
+    """受端电网等值机：惯量 + 负荷阻尼 + 一阶调速器，P0 为换流器初始出力"""
+    d_dwg = ((p_conv - p["P0"]) - d_load + p_gov - p["D_grid"] * dw_g) / (2 * p["H_grid"])
+    d_gov = (-p["K_gov"] * dw_g - p_gov) / p["T_gov"]
+    return d_dwg, d_gov
+
+
+# ==========================================
+# 构网型：虚拟同步机（摇摆方程）
+# 状态：δ 内电势相对电网的功角, ω_v 虚拟转子转速, Δω_g 电网频率偏差, 调速器出力
+# ==========================================
+def _vsg_power(x, p, t):
+    v_grid, _, _ = _disturbances(p, t)
+    e = p["E"] * _available(p, t)
+    x_total = p["X_f"] + 1.0 / p["SCR"]
+    return e * v_grid * np.sin(x[0]) / x_total, v_grid, e, x_total
+
+
+def _vsg_deriv(x, p, t):
+    delta, w_v, dw_g, p_gov = x
+    p_e, _, _, _ = _vsg_power(x, p, t)
+    _, d_load, p_ref = _disturbances(p, t)
+    p_ref = p_ref * _available(p, t)
+    w_g = 1.0 + dw_g
+    d_delta = OMEGA_BASE * (w_v - w_g)
+    d_wv = (p_ref - p["Dp"] * (w_v - 1.0) - p_e - p["D"] * (w_v - w_g)) / (2 * p["H"])
+    d_dwg, d_gov = _grid_deriv(p_e, d_load, dw_g, p_gov, p)
+    return np.stack([d_delta, d_wv, d_dwg, d_gov])
+
+
+def _vsg_outputs(x, p, t):
+    p_e, v_grid, e, x_total = _vsg_power(x, p, t)
+    x_g = 1.0 / p["SCR"]
+    # 并网点电压：内电势与电网电压按电抗分压
+    v_pcc = np.abs(x_g * e * np.exp(1j * x[0]) + p["X_f"] * v_grid) / x_total
+    return {"freq": F_NOMINAL * x[1], "grid_freq": F_NOMINAL * (1.0 + x[2]), "power": p_e, "voltage": v_pcc, "angle": x[0]}
+
+
+def simulate_vsg(params, t_end=10.0, dt=1e-3, decimate=10):
+    """
+    批量仿真构网型 VSG，params 来自 make_params / sweep_params
+    返回 {"t": (T,), "freq"/"grid_freq"/"power"/"voltage"/"angle": (场景数, T)}
+    初始功角无解（P_ref 超出静稳极限）的场景结果为 NaN
+    """
+    p = params
+    x_total = p["X_f"] + 1.0 / p["SCR"]
+    with np.errstate(invalid="ignore"):
+        delta0 = np.arcsin(p["P_ref"] * x_total / (p["E"] * p["V_grid"]))
+    zeros = np.zeros_like(delta0)
+    x0 = np.stack([delta0, np.ones_like(delta0), zeros, zeros])
+    p = {**p, "P0": p["P_ref"]}
+    return _integrate(_vsg_deriv, _vsg_outputs, x0, p, t_end, dt, decimate)
+
+
+# ==========================================
+# 跟网型：锁相环同步 + 电流源注入
+# 状态：φ PLL 相角相对电网, ξ PLL 积分器, Δω_g 电网频率偏差, 调速器出力
+# 弱电网下注入电流经 X_g 耦合回 PLL 的 q 轴电压，SCR 过低时失稳
+# ==========================================
+def _gfl_currents(x, p, t):
+    v_grid, _, p_ref = _disturbances(p, t)
+    i_d = np.minimum(p_ref / p["V_grid"], p["I_max"]) * _available(p, t)
+    x_g = 1.0 / p["SCR"]
+    v_d = v_grid * np.cos(x[0])
+    v_q = x_g * i_d - v_grid * np.sin(x[0])
+    return i_d, v_d, v_q
+
+
+def _gfl_deriv(x, p, t):
+    phi, xi, dw_g, p_gov = x
+    i_d, v_d, v_q = _gfl_currents(x, p, t)
+    _, d_load, _ = _disturbances(p, t)
+    w_pll = p["Kp_pll"] * v_q + p["Ki_pll"] * xi
+    d_phi = w_pll - OMEGA_BASE * dw_g
+    d_dwg, d_gov = _grid_deriv(v_d * i_d, d_load, dw_g, p_gov, p)
+    return np.stack([d_phi, v_q, d_dwg, d_gov])
+
+
+def _gfl_outputs(x, p, t):
+    i_d, v_d, v_q = _gfl_currents(x, p, t)
+    w_pll = p["Kp_pll"] * v_q + p["Ki_pll"] * x[1]
+    return {
+        "freq": F_NOMINAL + w_pll / (2 * np.pi),
+        "grid_freq": F_NOMINAL * (1.0 + x[2]),
+        "power": v_d * i_d,
+        "voltage": np.hypot(v_d, v_q),
+        "angle": x[0],
+    }
+
+
+def simulate_gfl(params, t_end=10.0, dt=1e-3, decimate=10):
+    """批量仿真跟网型（PLL）换流器，接口与 simulate_vsg 相同"""
+    p = params
+    i_d = np.minimum(p["P_ref"] / p["V_grid"], p["I_max"])
+    with np.errstate(invalid="ignore"):
+        phi0 = np.arcsin(i_d / p["SCR"] / p["V_grid"])
+    zeros = np.zeros_like(phi0)
+    x0 = np.stack([phi0, zeros, zeros, zeros])
+    p = {**p, "P0": p["V_grid"] * np.cos(phi0) * i_d}
+    return _integrate(_gfl_deriv, _gfl_outputs, x0, p, t_end, dt, decimate)
+
+
+MODELS = {"gfm": simulate_vsg, "gfl": simulate_gfl}
+
+
+def simulate(model, params, t_end=10.0, dt=1e-3, decimate=10):
+    """按名称选择模型：'gfm' 构网型 VSG / 'gfl' 跟网型 PLL"""
+    if model not in MODELS:
+        raise ValueError(f"未知模型: {model}")
+    return MODELS[model](params, t_end=t_end, dt=dt, decimate=decimate)
@@ -0,0 +1,177 @@
+import hashlib
+import io
+import os
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+INGEST_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+
+# 仿真导出数据的标准列：时间用 float64 保证精度，其余量降为 float32
+REQUIRED_COLUMNS = ["时间", "有功", "无功", "电压", "频率"]
+COLUMN_ALIASES = {
+    "time": "时间", "t": "时间",
+    "p": "有功", "power": "有功",
+    "q": "无功",
+    "u": "电压", "v": "电压", "voltage": "电压",
+    "f": "频率", "freq": "频率", "frequency": "频率",
+}
+ARROW_SCHEMA = pa.schema([("时间", pa.float64())] + [(c, pa.float32()) for c in REQUIRED_COLUMNS[1:]])
+
+CHUNK_ROWS = 200_000
+HASH_BLOCK = 4 * 1024 * 1024
+
+
+def _open(source):
+    """source 可以是文件路径或可 seek 的二进制文件对象（如 st.file_uploader 的返回值）"""
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, "rb"), True
+    return source, False
+
+
+def content_hash(source):
+    """分块计算内容哈希，不把整个文件读入内存"""
+    f, owned = _open(source)
+    try:
+        f.seek(0)
+        h = hashlib.sha1()
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+        f.seek(0)
+        return h.hexdigest()
+    finally:
+        if owned:
+            f.close()
+
+
+def normalize_columns(columns):
+    """列名统一成标准中文名，并校验必需列是否齐全，返回 {原列名: 标准列名}"""
+    mapping = {}
+    for col in columns:
+        name = str(col).strip()
+        std = name if name in REQUIRED_COLUMNS else COLUMN_ALIASES.get(name.lower())
+        if std and std not in mapping.values():
+            mapping[col] = std
+    missing = [c for c in REQUIRED_COLUMNS if c not in mapping.values()]
+    if missing:
+        raise ValueError(f"数据缺少必需列: {'、'.join(missing)}（需要: {'/'.join(REQUIRED_COLUMNS)}）")
+    return mapping
+
+
+def _detect_encoding(f):
+    head = f.read(64 * 1024)
+    f.seek(0)
+    for enc in ("utf-8-sig", "gbk"):
+        try:
+            head.decode(enc)
+            return enc
+        except UnicodeDecodeError as e:
+            # 截断在多字节字符中间不算失败
+            if e.start >= len(head) - 4:
+                return enc
+    return "latin-1"
+
+
+def _csv_chunks(f, chunk_rows):
+    encoding = _detect_encoding(f)
+    header = pd.read_csv(f, nrows=0, encoding=encoding).columns
+    f.seek(0)
+    mapping = normalize_columns(header)
+    reader = pd.read_csv(f, usecols=list(mapping), chunksize=chunk_rows, encoding=encoding)
+    for chunk in reader:
+        yield chunk.rename(columns=mapping)
+
+
+def _xlsx_chunks(f, chunk_rows):
+    from openpyxl import load_workbook
+
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    # 只读模式按行流式解析，不构建整张表；损坏或改了扩展名的文件统一报为校验失败
+    try:
+        wb = load_workbook(f, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError, OSError) as e:
+        raise ValueError(f"无法解析 Excel 文件（{type(e).__name__}: {e}）") from e
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise ValueError("Excel 文件为空")
+        mapping = normalize_columns([h for h in header if h is not None])
+        keep = [i for i, h in enumerate(header) if h in mapping]
+        names = [mapping[header[i]] for i in keep]
+        buf = []
+        for row in rows:
+            buf.append([row[i] for i in keep])
+            if len(buf) >= chunk_rows:
+                yield pd.DataFrame(buf, columns=names)
+                buf = []
+        if buf:
+            yield pd.DataFrame(buf, columns=names)
+    finally:
+        wb.close()
+
+
+def _to_table(chunk):
+    """逐列转为数值并降精度，非法值记为 NaN"""
+    arrays = []
+    for field in ARROW_SCHEMA:
+        values = pd.to_numeric(chunk[field.name], errors="coerce").to_numpy(dtype=np.float64)
+        arrays.append(pa.array(values.astype(field.type.to_pandas_dtype(), copy=False)))
+    return pa.Table.from_arrays(arrays, schema=ARROW_SCHEMA)
+
+
+def ingest(source, filename, out_dir=INGEST_DIR, chunk_rows=CHUNK_ROWS):
+    """
+    流式解析 csv/xlsx 并写成 Parquet（每个分块一个 row group），内存占用只与 chunk_rows 有关
+    以内容哈希命名输出文件，同一份数据再次上传时直接复用，不重复解析
+    返回 {"path", "rows", "row_groups", "bytes_in", "seconds", "cached"}
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in (".csv", ".xlsx"):
+        raise ValueError(f"不支持的文件类型: {ext}")
+
+    t0 = time.perf_counter()
+    f, owned = _open(source)
+    try:
+        digest = content_hash(f)
+        f.seek(0, io.SEEK_END)
+        size = f.tell()
+        f.seek(0)
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, f"{digest}.parquet")
+        if os.path.exists(path):
+            meta = pq.ParquetFile(path).metadata
+            return {"path": path, "rows": meta.num_rows, "row_groups": meta.num_row_groups,
+                    "bytes_in": size, "seconds": time.perf_counter() - t0, "cached": True}
+
+        chunks = _csv_chunks(f, chunk_rows) if ext == ".csv" else _xlsx_chunks(f, chunk_rows)
+        tmp = path + ".tmp"
+        rows = groups = 0
+        try:
+            with pq.ParquetWriter(tmp, ARROW_SCHEMA, compression="zstd") as writer:
+                for chunk in chunks:
+                    writer.write_table(_to_table(chunk))
+                    rows += len(chunk)
+                    groups += 1
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    finally:
+        if owned:
+            f.close()
+    return {"path": path, "rows": rows, "row_groups": groups,
+            "bytes_in": size, "seconds": time.perf_counter() - t0, "cached": False}
+
+
+def read_preview(path, n=100):
+    """只读取第一个批次的前 n 行用于预览"""
+    batch = next(pq.ParquetFile(path).iter_batches(batch_size=n), None)
+    if batch is None:
+        return pd.DataFrame(columns=REQUIRED_COLUMNS)
+    return batch.to_pandas()
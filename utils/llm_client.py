@@ -0,0 +1,179 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+
+DEFAULT_BASE_URL = "https://api.deepseek.com"
+DEFAULT_MODEL = "deepseek-chat"
+
+# 任务状态
+QUEUED, RUNNING, DONE, ERROR, CANCELLED = "queued", "running", "done", "error", "cancelled"
+
+
+class ChatJob:
+    """
+    一次对话请求，由后台事件循环写入、页面脚本线程读取
+    页面每次轮询都应调用 touch()；长时间无人轮询（会话关闭/离开页面）的任务会被自动取消
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, service, session_id, prepare):
+        self.id = next(self._ids)
+        self.service = service
+        self.session_id = session_id
+        self.prepare = prepare      # 可调用对象，在线程池中执行，返回发给模型的 messages（检索等耗时步骤放在这里）
+        self.status = QUEUED
+        self.error = None
+        self.t_submit = time.monotonic()
+        self.t_first_token = None
+        self.t_done = None
+        self.last_seen = self.t_submit
+        self._parts = []
+        self._task = None
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+    @property
+    def finished(self):
+        return self.status in (DONE, ERROR, CANCELLED)
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def cancel(self):
+        self.service.cancel(self)
+
+    def _append(self, delta):
+        if self.t_first_token is None:
+            self.t_first_token = time.monotonic()
+        self._parts.append(delta)
+
+
+class LLMService:
+    """
+    后台事件循环上的共享异步大模型客户端
+    - 整个进程复用一个 AsyncOpenAI（连接池），不再每条消息新建客户端；
+    - 同一会话的请求按提交顺序排队执行，不同会话并发，总并发数受 max_concurrency 限制；
+    - 页面脚本只负责提交任务与轮询已生成的文本，不会被流式输出阻塞。
+    base_url 可指向任意 OpenAI 兼容服务（包括本地 mock 服务）。
+    """
+
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL, model=DEFAULT_MODEL, max_concurrency=4,
+                 max_pending_per_session=3, idle_timeout=30.0, request_timeout=120.0):
+        self.model = model
+        self.max_pending_per_session = max_pending_per_session
+        self.idle_timeout = idle_timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-event-loop", daemon=True)
+        self._thread.start()
+        self._queues = {}           # session_id -> deque[ChatJob]，只在事件循环线程内访问
+        self._jobs = {}             # job.id -> ChatJob，未结束的任务
+        self._lock = threading.Lock()
+
+        async def setup():
+            from openai import AsyncOpenAI  # 较重，首次创建服务时才导入
+
+            self._client = AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=request_timeout)
+            self._sem = asyncio.Semaphore(max_concurrency)
+            self._loop.create_task(self._watchdog())
+
+        asyncio.run_coroutine_threadsafe(setup(), self._loop).result()
+
+    # ---------- 脚本线程调用 ----------
+    def submit(self, session_id, prepare):
+        """提交请求，立即返回 ChatJob；该会话排队任务过多时抛出 RuntimeError"""
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if j.session_id == session_id)
+            if pending >= self.max_pending_per_session:
+                raise RuntimeError(f"当前会话已有 {pending} 个请求在处理，请稍后再试")
+            job = ChatJob(self, session_id, prepare)
+            self._jobs[job.id] = job
+        self._loop.call_soon_threadsafe(self._enqueue, job)
+        return job
+
+    def cancel(self, job):
+        self._loop.call_soon_threadsafe(self._cancel, job)
+
+    def cancel_session(self, session_id):
+        with self._lock:
+            jobs = [j for j in self._jobs.values() if j.session_id == session_id]
+        for job in jobs:
+            self.cancel(job)
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {"running": sum(j.status == RUNNING for j in jobs), "queued": sum(j.status == QUEUED for j in jobs)}
+
+    def close(self):
+        async def shutdown():
+            await self._client.close()
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    # ---------- 事件循环线程内 ----------
+    def _enqueue(self, job):
+        queue = self._queues.get(job.session_id)
+        if queue is None:
+            queue = self._queues[job.session_id] = deque()
+            self._loop.create_task(self._session_worker(job.session_id, queue))
+        queue.append(job)
+
+    def _cancel(self, job):
+        if job.finished:
+            return
+        if job._task is not None:
+            job._task.cancel()
+        else:
+            self._finish(job, CANCELLED)
+
+    def _finish(self, job, status, error=None):
+        job.status = status
+        job.error = error
+        job.t_done = time.monotonic()
+        with self._lock:
+            self._jobs.pop(job.id, None)
+
+    async def _session_worker(self, session_id, queue):
+        try:
+            while queue:
+                job = queue.popleft()
+                if job.finished:
+                    continue
+                job._task = self._loop.create_task(self._run(job))
+                await asyncio.wait({job._task})
+        finally:
+            del self._queues[session_id]
+
+    async def _run(self, job):
+        try:
+            messages = await self._loop.run_in_executor(None, job.prepare)
+            async with self._sem:
+                job.status = RUNNING
+                stream = await self._client.chat.completions.create(model=self.model, messages=messages, stream=True)
+                try:
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            job._append(delta)
+                finally:
+                    await stream.close()
+            self._finish(job, DONE)
+        except asyncio.CancelledError:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            self._finish(job, ERROR, str(e))
+
+    async def _watchdog(self):
+        """取消长时间无人轮询的任务（浏览器会话已关闭或用户离开了页面）"""
+        while True:
+            await asyncio.sleep(1.0)
+            now = time.monotonic()
+            with self._lock:
+                stale = [j for j in self._jobs.values() if now - j.last_seen > self.idle_timeout]
+            for job in stale:
+                self._cancel(job)
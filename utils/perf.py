@@ -0,0 +1,293 @@
+import bisect
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import streamlit as st
+
+# 设为 0 时计时器退化为空操作
+ENABLED = os.environ.get("APP_PERF", "1") != "0"
+
+# 直方图桶上界（秒），与 Prometheus 默认桶相近，覆盖 0.1 ms ~ 10 s
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_SESSIONS = 200          # 保留最近活跃的若干会话的分会话直方图
+
+
+class Histogram:
+    """固定桶直方图：记录一次只需一次二分查找，分位数在桶内线性插值估计"""
+
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if seen + c >= rank and c:
+                lo = BUCKETS[i - 1] if i > 0 else 0.0
+                hi = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(lo + (hi - lo) * (rank - seen) / c, self.max)
+            seen += c
+        return self.max
+
+
+class PerfRegistry:
+    """进程级计时注册表：全局与分会话两套直方图，外加按需读取的指标采集函数"""
+
+    def __init__(self, max_sessions=MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._global = {}
+        self._sessions = OrderedDict()
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, session=None):
+        with self._lock:
+            hist = self._global.get(name)
+            if hist is None:
+                hist = self._global[name] = Histogram()
+            hist.observe(seconds)
+            if session is None:
+                return
+            per = self._sessions.get(session)
+            if per is None:
+                per = self._sessions[session] = {}
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session)
+            hist = per.get(name)
+            if hist is None:
+                hist = per[name] = Histogram()
+            hist.observe(seconds)
+
+    def rows(self, session=None):
+        """[{"代码段", "次数", "平均(ms)", "P50(ms)", "P99(ms)", "最大(ms)", "累计(s)"}]，按累计耗时降序"""
+        with self._lock:
+            hists = self._global if session is None else self._sessions.get(session, {})
+            rows = [{"代码段": name, "次数": h.count, "平均(ms)": h.sum / h.count * 1e3,
+                     "P50(ms)": h.quantile(0.5) * 1e3, "P99(ms)": h.quantile(0.99) * 1e3,
+                     "最大(ms)": h.max * 1e3, "累计(s)": h.sum} for name, h in hists.items() if h.count]
+        return sorted(rows, key=lambda r: -r["累计(s)"])
+
+    def reset(self):
+        with self._lock:
+            self._global.clear()
+            self._sessions.clear()
+
+    def add_collector(self, name, fn):
+        """注册指标采集函数：fn() 返回 {指标名: 数值}，在导出时才调用"""
+        with self._lock:
+            self._collectors[name] = fn
+
+    def collect(self):
+        with self._lock:
+            collectors = list(self._collectors.items())
+        values = {}
+        for name, fn in collectors:
+            try:
+                values[name] = {k: float(v) for k, v in fn().items()}
+            except Exception as e:
+                values[name] = {"error": 1.0}
+                print(f"指标采集 {name} 失败: {e}")
+        return values
+
+    def to_prometheus(self):
+        """Prometheus 文本格式：代码段耗时直方图 + 各采集函数的 gauge"""
+        lines = ["# HELP app_section_seconds 代码段耗时", "# TYPE app_section_seconds histogram"]
+        with self._lock:
+            hists = [(name, list(h.counts), h.sum, h.count) for name, h in self._global.items()]
+        for name, counts, total, count in hists:
+            label = _escape(name)
+            cumulative = 0
+            for le, c in zip(BUCKETS, counts):
+                cumulative += c
+                lines.append(f'app_section_seconds_bucket{{section="{label}",le="{le}"}} {cumulative}')
+            lines.append(f'app_section_seconds_bucket{{section="{label}",le="+Inf"}} {count}')
+            lines.append(f'app_section_seconds_sum{{section="{label}"}} {total:.6f}')
+            lines.append(f'app_section_seconds_count{{section="{label}"}} {count}')
+        lines += ["# HELP app_gauge 组件运行状态", "# TYPE app_gauge gauge"]
+        for component, values in self.collect().items():
+            for key, value in values.items():
+                lines.append(f'app_gauge{{component="{_escape(component)}",name="{_escape(key)}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = PerfRegistry()
+
+
+def current_session():
+    """当前脚本运行所属的会话 id，后台线程中为 None"""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+
+# =========================================================
+# 计时接口：上下文管理器与装饰器
+# =========================================================
+class timer:
+    """with timer("段名"): ...  结束时记入全局与当前会话的直方图"""
+
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if ENABLED:
+            REGISTRY.observe(self.name, time.perf_counter() - self.t0, current_session())
+        return False
+
+
+def timed(name=None):
+    """函数计时装饰器，可写作 @timed 或 @timed("段名")；段名缺省为函数名"""
+    def decorate(fn, label):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                REGISTRY.observe(label, time.perf_counter() - t0, current_session())
+        return wrapper
+
+    if callable(name):
+        return decorate(name, name.__name__)
+    return lambda fn: decorate(fn, name or fn.__name__)
+
+
+# =========================================================
+# 采样分析器：后台线程定时抓取其他线程的调用栈
+# =========================================================
+class SamplingProfiler:
+    """
+    每 interval 秒读取一次 sys._current_frames()，统计函数的自身 / 累计采样占比，
+    被测线程不做任何插桩，开销只在采样线程一侧；thread_prefix 只采样名称匹配的线程（如 Streamlit 脚本线程），
+    exclude 为不采样的线程 id（如发起采样、正在等待结果的线程）
+    """
+
+    def __init__(self, interval=0.005, thread_prefix=None, exclude=(), max_depth=64):
+        self.interval = interval
+        self.thread_prefix = thread_prefix
+        self.exclude = set(exclude)
+        self.max_depth = max_depth
+        self.samples = 0
+        self.stacks = Counter()
+        self.done = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self, duration):
+        skip = self.exclude | {threading.get_ident()}
+        names = {}
+        deadline = time.monotonic() + duration if duration else None
+        while not self._stop.is_set() and (deadline is None or time.monotonic() < deadline):
+            if self.thread_prefix is not None:
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident in skip or (self.thread_prefix is not None and not names.get(ident, "").startswith(self.thread_prefix)):
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+            self._stop.wait(self.interval)
+        self.done.set()
+
+    def start(self, duration=None):
+        self._thread = threading.Thread(target=self._run, args=(duration,), name="perf-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        return self
+
+    def top(self, n=30):
+        """[{"函数", "自身占比", "累计占比", "采样数"}]，按自身占比降序"""
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for func in set(stack):
+                total[func] += count
+        samples = max(self.samples, 1)
+        return [{"函数": func, "自身占比": own[func] / samples, "累计占比": total[func] / samples, "采样数": total[func]}
+                for func, _ in own.most_common(n)]
+
+    def collapsed(self):
+        """折叠栈文本（flamegraph.pl / speedscope 可直接读取）"""
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common())
+
+
+# =========================================================
+# Prometheus 拉取端点
+# =========================================================
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@st.cache_resource
+def start_metrics_exporter():
+    """
+    配置了环境变量 PERF_METRICS_PORT 时，每个进程启动一次 /metrics 端点；否则什么也不做
+    端点没有鉴权，默认只监听本机；需要被其他主机抓取时用 PERF_METRICS_HOST 指定监听地址
+    """
+    port = os.environ.get("PERF_METRICS_PORT")
+    if not port:
+        return None
+    host = os.environ.get("PERF_METRICS_HOST", "127.0.0.1")
+    try:
+        server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+    except (OSError, ValueError) as e:
+        print(f"性能指标端点启动失败: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="perf-metrics", daemon=True).start()
+    print(f"性能指标端点已启动: http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.sparse_index import rrf_fuse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INDEX_DIR = os.path.join(ROOT_DIR, "faiss_index")
+CACHE_PATH = os.path.join(ROOT_DIR, "rag_cache.sqlite3")
+SCHEMA_VERSION = 2
+
+
+def normalize_query(query):
+    """全角转半角、去首尾空白、合并连续空白，使等价问法命中同一缓存项（不改大小写，以免影响英文缩写的语义）"""
+    text = unicodedata.normalize("NFKC", query).strip()
+    return " ".join(text.split())
+
+
+def index_version(index_dir=INDEX_DIR):
+    """
+    索引版本标识：清单版本号 + index.faiss 的修改时间与大小
+    build_rag 每次保存都会整体替换目录，因此重建后版本必然变化
+    """
+    try:
+        st = os.stat(os.path.join(index_dir, "index.faiss"))
+    except FileNotFoundError:
+        return None
+    try:
+        with open(os.path.join(index_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest_version = json.load(f).get("version", 0)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest_version = 0
+    return f"{manifest_version}-{st.st_mtime_ns}-{st.st_size}"
+
+
+class _LRU:
+    """按条目数限制容量的 LRU（线程安全）"""
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class QueryCache:
+    """
+    两级检索缓存：进程内 LRU + SQLite 磁盘缓存（跨会话、跨重启共享）
+    - 问题向量按 (嵌入模型, 规范化问题) 缓存，与索引版本无关，重建索引后仍可复用；
+    - 检索结果按 (索引版本, 规范化问题, 检索参数) 缓存，发现索引版本变化时自动清掉旧版本结果。
+    """
+
+    def __init__(self, path=CACHE_PATH, memory_items=512):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # 结果表结构变化时直接丢弃旧结果（向量表保持不变）
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS results")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (model TEXT, query TEXT, vector BLOB, PRIMARY KEY (model, query))")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results (version TEXT, query TEXT, mode TEXT, docs TEXT, PRIMARY KEY (version, query, mode))")
+        self._conn.commit()
+        self._vectors = _LRU(memory_items)
+        self._results = _LRU(memory_items)
+        self._version = None
+        self.hits = {"memory": 0, "disk": 0, "miss": 0}
+
+    @staticmethod
+    def _key(*parts):
+        return hashlib.sha1("\x1f".join(map(str, parts)).encode("utf-8")).hexdigest()
+
+    def _check_version(self, version):
+        """索引版本变化时清空内存结果并删除磁盘上其他版本的结果"""
+        if version == self._version:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM results WHERE version != ?", (version,))
+            self._conn.commit()
+            self._results.clear()
+            self._version = version
+
+    def _get_vector(self, model, query):
+        key = self._key(model, query)
+        vector = self._vectors.get(key)
+        if vector is None:
+            with self._lock:
+                row = self._conn.execute("SELECT vector FROM embeddings WHERE model = ? AND query = ?", (model, query)).fetchone()
+            if row is not None:
+                vector = np.frombuffer(row[0], dtype=np.float32)
+                self._vectors.put(key, vector)
+        return vector
+
+    def _put_vector(self, model, query, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        self._vectors.put(self._key(model, query), vector)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", (model, query, vector.tobytes()))
+            self._conn.commit()
+        return vector
+
+    def search(self, load_db, version, query, k=3, model="", fetch_k=None, lambda_mult=0.5, load_sparse=None):
+        """
+        带缓存的 db.similarity_search(query, k)，返回 Document 列表
+        load_db 为返回向量库的可调用对象，只在未命中时才调用（命中时无需加载嵌入模型）；
+        version 为 index_version()，model 为嵌入模型名（区分不同模型的向量）；
+        给出 fetch_k 时先取 fetch_k 个候选，再用 MMR 选出相关且互不重复的结果；
+        load_sparse 返回 SparseIndex（或 None）时做 BM25 + 向量混合检索，两路结果按 RRF 融合
+        """
+        from langchain_core.documents import Document
+
+        self._check_version(version)
+        norm = normalize_query(query)
+        mode = f"{k}" if fetch_k is None else f"{k}/mmr{fetch_k}/{lambda_mult}"
+        if load_sparse is not None:
+            mode += "/hybrid"
+        key = self._key(version, norm, mode)
+        docs = self._results.get(key)
+        if docs is not None:
+            self.hits["memory"] += 1
+            return [Document(**d) for d in docs]
+        with self._lock:
+            row = self._conn.execute("SELECT docs FROM results WHERE version = ? AND query = ? AND mode = ?", (version, norm, mode)).fetchone()
+        if row is not None:
+            self.hits["disk"] += 1
+            docs = json.loads(row[0])
+            self._results.put(key, docs)
+            return [Document(**d) for d in docs]
+
+        self.hits["miss"] += 1
+        db = load_db()
+        sparse = load_sparse() if load_sparse is not None else None
+        vector = self._get_vector(model, norm)
+        if vector is None:
+            vector = self._put_vector(model, norm, db.embeddings.embed_query(norm))
+        # 混合检索时两路各取 2k 个候选再融合
+        n_dense = k if sparse is None else 2 * k
+        if fetch_k is None:
+            found = db.similarity_search_by_vector(vector.tolist(), k=n_dense)
+        else:
+            found = db.max_marginal_relevance_search_by_vector(vector.tolist(), k=n_dense, fetch_k=max(fetch_k, n_dense), lambda_mult=lambda_mult)
+        if sparse is not None:
+            dense = {d.id: d for d in found if d.id is not None}
+            hits = [doc_id for doc_id, _ in sparse.search(norm, 2 * k)]
+            fused = rrf_fuse(list(dense), hits)[:k]
+            found = [dense[i] if i in dense else db.docstore.search(i) for i in fused]
+            found = [d for d in found if isinstance(d, Document)]
+        docs = [{"page_content": d.page_content, "metadata": d.metadata} for d in found]
+        self._results.put(key, docs)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                               (version, norm, mode, json.dumps(docs, ensure_ascii=False)))
+            self._conn.commit()
+        return found
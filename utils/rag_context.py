@@ -0,0 +1,123 @@
+import hashlib
+import math
+import re
+
+# 单次请求的 token 预算（按本地估算）
+CONTEXT_BUDGET = 1500   # 参考资料
+HISTORY_BUDGET = 1200   # 原样保留的近期对话
+SUMMARY_BUDGET = 300    # 更早对话的滚动摘要
+TURN_SNIPPET = 60       # 摘要中每条旧消息保留的 token 数
+NEAR_DUP_JACCARD = 0.85
+
+_CJK = re.compile(r"[\u2e80-\u9fff\uf900-\ufaff\uff00-\uffef\u3000-\u303f]")
+_WORD = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+_SENTENCE_END = re.compile(r"(?<=[。！？!?；;\n])")
+
+
+def estimate_tokens(text):
+    """
+    本地快速估算 token 数，无需加载分词器
+    中文约 0.7 token/字，英文单词按每 4 个字母 1 token，数字与标点各算 1 个；整体略偏保守
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    rest = _CJK.sub(" ", text)
+    words = sum(max(1, math.ceil(len(w) / 4)) for w in _WORD.findall(rest))
+    return math.ceil(cjk * 0.7) + words
+
+
+def truncate_tokens(text, budget):
+    """截断到不超过 budget 个估算 token（按比例预估切点，再逐步收缩）"""
+    n = estimate_tokens(text)
+    if n <= budget:
+        return text
+    if budget <= 0:
+        return ""
+    cut = int(len(text) * budget / n)
+    while cut > 0 and estimate_tokens(text[:cut]) > budget - 1:  # 留 1 个给省略号
+        cut = int(cut * 0.9)
+    return text[:cut].rstrip() + "…"
+
+
+def _shingles(text, n=3):
+    text = re.sub(r"\s+", "", text)
+    return {text[i:i + n] for i in range(max(len(text) - n + 1, 1))}
+
+
+def dedup_chunks(docs, threshold=NEAR_DUP_JACCARD):
+    """去掉完全重复与高度重叠（字符 3-gram Jaccard ≥ threshold）的知识块，保持原有排序"""
+    kept, seen, kept_shingles = [], set(), []
+    for doc in docs:
+        digest = hashlib.sha1(re.sub(r"\s+", "", doc.page_content).encode("utf-8")).digest()
+        if digest in seen:
+            continue
+        sh = _shingles(doc.page_content)
+        if any(len(sh & other) / len(sh | other) >= threshold for other in kept_shingles):
+            continue
+        seen.add(digest)
+        kept.append(doc)
+        kept_shingles.append(sh)
+    return kept
+
+
+def assemble_context(docs, budget=CONTEXT_BUDGET):
+    """按检索排序依次放入去重后的知识块，直到用完预算；放不下的最后一块截断放入"""
+    parts, used = [], 0
+    for doc in dedup_chunks(docs):
+        cost = estimate_tokens(doc.page_content)
+        if used + cost <= budget:
+            parts.append(doc.page_content)
+            used += cost
+        else:
+            if budget - used > 50:
+                parts.append(truncate_tokens(doc.page_content, budget - used))
+            break
+    return "\n\n".join(parts)
+
+
+def _first_sentences(text, budget):
+    """摘取开头几句，不超过 budget 个 token"""
+    out, used = [], 0
+    for sentence in _SENTENCE_END.split(text.strip()):
+        cost = estimate_tokens(sentence)
+        if used + cost > budget:
+            break
+        out.append(sentence)
+        used += cost
+    return "".join(out).strip() or truncate_tokens(text.strip(), budget)
+
+
+def compact_history(history, budget=HISTORY_BUDGET, summary_budget=SUMMARY_BUDGET, skip_prefixes=("🚨", "⚠️")):
+    """
+    压缩对话历史：从最近一条往前原样保留，直到用完 budget；
+    更早的消息每条只摘取开头一两句，合成滚动摘要（越新的越优先保留），作为一条 system 消息放在最前。
+    报错提示类消息（以 skip_prefixes 开头）不发给模型。
+    返回新的 messages 列表，总长度与对话轮数无关。
+    """
+    history = [m for m in history if not m["content"].startswith(skip_prefixes)]
+    used = 0
+    i = len(history)
+    while i > 0:
+        cost = estimate_tokens(history[i - 1]["content"])
+        if used + cost > budget:
+            break
+        used += cost
+        i -= 1
+    recent = history[i:]
+    if i == 0:
+        return recent
+
+    lines, used = [], 0
+    for m in reversed(history[:i]):
+        who = "用户问" if m["role"] == "user" else "助手答"
+        line = f"{who}：{_first_sentences(m['content'], TURN_SNIPPET)}"
+        cost = estimate_tokens(line)
+        if used + cost > summary_budget:
+            break
+        lines.append(line)
+        used += cost
+    if not lines:
+        return recent
+    summary = "此前对话摘要（按时间顺序）：\n" + "\n".join(reversed(lines))
+    return [{"role": "system", "content": summary}] + recent
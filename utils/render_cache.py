@@ -0,0 +1,116 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import streamlit as st
+
+
+def input_key(*inputs):
+    """输入摘要：数组按内容（含形状与类型）哈希，其余按 repr，输入不变则键不变"""
+    h = hashlib.blake2b(digest_size=16)
+    for value in inputs:
+        if isinstance(value, np.ndarray):
+            h.update(f"{value.dtype}{value.shape}".encode())
+            h.update(np.ascontiguousarray(value).tobytes())
+        else:
+            h.update(repr(value).encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class RenderCache:
+    """
+    进程级渲染结果缓存：同样输入的 Plotly 图对象只构建一次，所有会话共用
+    st.plotly_chart 对已构建的 Figure 只做 to_dict + 序列化，省去每次重跑时构造 / 校验图对象的开销
+    """
+
+    def __init__(self, max_items=256):
+        self.max_items = max_items
+        self.hits = self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, name, build, *inputs):
+        key = (name, input_key(*inputs))
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = build(*inputs)
+        with self._lock:
+            self._items[key] = value
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"items": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+@st.cache_resource
+def get_render_cache():
+    from utils.perf import REGISTRY
+
+    cache = RenderCache()
+    REGISTRY.add_collector("render_cache", cache.stats)
+    return cache
+
+
+def cached_figure(name, build, *inputs):
+    """build(*inputs) -> go.Figure；返回的图对象被多个会话共用，调用方不要修改它"""
+    return get_render_cache().get_or_build(name, build, *inputs)
+
+
+def live_figure(name, build, **trace):
+    """
+    每秒刷新的小图：样式（build() 生成的图）每个会话只构建一次，之后只替换第一条曲线的数据
+    图对象放在会话状态里，各会话互不影响
+    """
+    figures = st.session_state.setdefault("_live_figures", {})
+    fig = figures.get(name)
+    if fig is None:
+        fig = figures[name] = build()
+    with fig.batch_update():
+        fig.data[0].update(**trace)
+    return fig
+
+
+# =========================================================
+# 聊天记录增量渲染
+# =========================================================
+ROLE_LABELS = {"user": "🧑 **我**", "assistant": "🤖 **智多星**"}
+ARCHIVE_BLOCK = 10           # 每攒满这么多条较早的消息归档成一个不再变化的 Markdown 段
+
+
+class ChatTranscript:
+    """
+    把较早的对话按每 block_size 条归档成一个 Markdown 段，段一旦生成就不再变化：
+    每个段单独作为一个元素渲染，内容不变的元素由 Streamlit 的消息缓存只发送引用，
+    因此每次重跑真正下发的只有最近几条消息，与历史长度无关
+    """
+
+    def __init__(self, block_size=ARCHIVE_BLOCK):
+        self.block_size = block_size
+        self.blocks = []
+
+    def archived(self, n_messages, keep_live):
+        """保留至少 keep_live 条实时消息时，可归档的消息条数（block_size 的整数倍）"""
+        return max(n_messages - keep_live, 0) // self.block_size * self.block_size
+
+    def sync(self, messages):
+        """messages 为只追加的已归档消息（长度为 block_size 的整数倍）；列表被重置（变短）时从头重建"""
+        n_blocks = len(messages) // self.block_size
+        if n_blocks < len(self.blocks):
+            self.blocks = []
+        for b in range(len(self.blocks), n_blocks):
+            parts = []
+            for msg in messages[b * self.block_size:(b + 1) * self.block_size]:
+                label = ROLE_LABELS.get(msg["role"], msg["role"])
+                parts.append(f"{label}\n\n{msg['content']}\n\n---\n\n")
+            self.blocks.append("".join(parts))
+        return self.blocks
@@ -0,0 +1,98 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+    多通道定长环形缓冲区（NumPy 预分配）
+    每个采样点同时写入 pos 与 pos+capacity 两处（双写镜像），
+    因此任意“最近 n 点”窗口始终是一段连续内存，可直接返回零拷贝视图。
+    """
+
+    def __init__(self, channels, capacity, dtype=np.float64, fill=np.nan):
+        if capacity <= 0:
+            raise ValueError("capacity 必须为正整数")
+        self.channels = list(channels)
+        self.capacity = int(capacity)
+        self._index = {name: i for i, name in enumerate(self.channels)}
+        self._data = np.full((len(self.channels), 2 * self.capacity), fill, dtype=dtype)
+        self._head = 0      # 下一个写入位置 (0 ~ capacity-1)
+        self._size = 0      # 当前有效点数 (<= capacity)
+        self.count = 0      # 累计写入点数（单调递增，可作为序号）
+
+    def __len__(self):
+        return self._size
+
+    def _row(self, channel):
+        try:
+            return self._index[channel]
+        except KeyError:
+            raise KeyError(f"未知通道: {channel}") from None
+
+    def _as_column(self, values):
+        """把 dict / 序列统一成按通道顺序排列的一维数组"""
+        if isinstance(values, dict):
+            return np.array([values[name] for name in self.channels], dtype=self._data.dtype)
+        return np.asarray(values, dtype=self._data.dtype).reshape(len(self.channels))
+
+    def append(self, values):
+        """追加一个采样点（所有通道），O(1)"""
+        col = self._as_column(values)
+        h = self._head
+        self._data[:, h] = col
+        self._data[:, h + self.capacity] = col
+        self._head = (h + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self.count += 1
+
+    def extend(self, block):
+        """批量追加，block 形状为 (通道数, k) 或 {通道: 一维数组}"""
+        if isinstance(block, dict):
+            block = np.vstack([np.asarray(block[name], dtype=self._data.dtype) for name in self.channels])
+        block = np.asarray(block, dtype=self._data.dtype)
+        if block.ndim != 2 or block.shape[0] != len(self.channels):
+            raise ValueError(f"block 形状应为 ({len(self.channels)}, k)，实际为 {block.shape}")
+        k = block.shape[1]
+        if k == 0:
+            return
+        self.count += k
+        if k > self.capacity:
+            block = block[:, -self.capacity:]
+            k = self.capacity
+        pos = (self._head + np.arange(k)) % self.capacity
+        self._data[:, pos] = block
+        self._data[:, pos + self.capacity] = block
+        self._head = (self._head + k) % self.capacity
+        self._size = min(self._size + k, self.capacity)
+
+    def fill(self, values, n=None):
+        """用常数（每通道一个值）预填充 n 个点，常用于曲线初始基线"""
+        n = self.capacity if n is None else min(int(n), self.capacity)
+        col = self._as_column(values)
+        self.extend(np.repeat(col[:, None], n, axis=1))
+
+    def window(self, channel=None, n=None):
+        """
+        返回最近 n 个点的只读零拷贝视图（按时间从旧到新）
+        channel 为 None 时返回全部通道，形状 (通道数, n)
+        """
+        n = self._size if n is None else min(int(n), self._size)
+        end = self._head + self.capacity
+        if channel is None:
+            view = self._data[:, end - n:end]
+        else:
+            view = self._data[self._row(channel), end - n:end]
+        view.flags.writeable = False
+        return view
+
+    def latest(self, channel=None):
+        """最新一个采样值"""
+        if self._size == 0:
+            raise IndexError("缓冲区为空")
+        col = (self._head - 1) % self.capacity
+        if channel is None:
+            return self._data[:, col].copy()
+        return self._data[self._row(channel), col].item()
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
@@ -0,0 +1,310 @@
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pyarrow.parquet as pq
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.ingest import INGEST_DIR
+
+ANALYTICS_DIR = os.path.join(INGEST_DIR, "analytics")
+ANALYTICS_VERSION = 2        # 算法或判据变化时加 1，旧的缓存结果自然失效
+
+PRE_EVENT_FRACTION = 0.05    # 取开头 5% 样本的中位数作为扰动前基准，末尾 5% 作为稳态终值
+SAG_THRESHOLD = 0.9          # 低于 0.9 倍基准电压记为跌落
+SETTLE_FRACTION = 0.05       # 频率恢复判据：进入并保持在终值 ±5% 最大偏差内
+SETTLE_FLOOR_HZ = 0.005      # 恢复带宽下限，避免被测量噪声卡住
+MIN_EVENT_HZ = 0.01          # 最大频率偏差低于此值视为无扰动
+ROCOF_WINDOW = 0.1           # ROCOF 计算窗口 s（与故障检测一致）
+PENCIL_SAMPLES = 256         # 模态拟合前把恢复段重采样到固定点数，不同运行可堆叠成一批
+PENCIL_ORDER = 4             # 矩阵束保留的模态数（一对振荡模态 + 两个实模态）
+MIN_OSC_HZ = 0.02            # 低于此频率的模态按非振荡处理
+
+PARALLEL_MIN = 8             # 待分析文件少于此数时在当前进程内计算，省去进程池启动开销
+CHUNK_RUNS = 64              # 每个任务处理的文件数（任务内等长运行合批计算）
+
+METRIC_LABELS = {
+    "sag_depth": "电压跌落深度",
+    "sag_duration": "跌落持续(s)",
+    "nadir": "频率极值(Hz)",
+    "rocof": "最大ROCOF(Hz/s)",
+    "settling_time": "频率恢复耗时(s)",
+    "damping": "阻尼比",
+}
+
+
+# =========================================================
+# 1. 向量化指标：沿最后一维计算，(运行数, 采样点) 的等长批次可一次算完
+#    t 可以是所有运行共用的 (采样点,) 或逐运行的 (运行数, 采样点)
+# =========================================================
+def _edge_median(x, head=True):
+    n = max(1, int(x.shape[-1] * PRE_EVENT_FRACTION))
+    return np.median(x[..., :n] if head else x[..., -n:], axis=-1)
+
+
+def _take(t, idx):
+    """按各运行的下标 idx 取时刻"""
+    t = np.broadcast_to(t, np.shape(idx) + t.shape[-1:])
+    return np.take_along_axis(t, np.asarray(idx)[..., None], axis=-1)[..., 0]
+
+
+def sag_metrics(t, v):
+    """电压跌落深度（相对扰动前基准）与低于 SAG_THRESHOLD 的累计时长"""
+    pu = v / _edge_median(v)[..., None]
+    depth = np.clip(1.0 - pu.min(axis=-1), 0.0, None)
+    below = pu[..., :-1] < SAG_THRESHOLD
+    duration = (below * np.diff(t, axis=-1)).sum(axis=-1)
+    return depth, duration
+
+
+def frequency_metrics(t, f):
+    """
+    频率极值（偏离基准最大的点）、最大 ROCOF 与恢复耗时
+    恢复耗时从频率首次越出恢复带算起，到最后一次越出之后为止；结束时仍未恢复或无扰动均记为 NaN，
+    两者用 onset 区分：返回 (nadir, rocof, settling_time, onset)，onset 为扰动起点下标（无扰动时为 -1）
+    """
+    base = _edge_median(f)
+    dev = f - base[..., None]
+    peak = np.take_along_axis(dev, np.abs(dev).argmax(axis=-1)[..., None], axis=-1)[..., 0]
+    nadir = base + peak
+
+    n = f.shape[-1]
+    w = int(np.clip(round(ROCOF_WINDOW / np.median(np.diff(t, axis=-1))), 1, n - 1))
+    rocof = np.abs((f[..., w:] - f[..., :-w]) / (t[..., w:] - t[..., :-w])).max(axis=-1)
+
+    final = _edge_median(f, head=False)
+    band = np.maximum(SETTLE_FRACTION * np.abs(f - final[..., None]).max(axis=-1), SETTLE_FLOOR_HZ)
+    started = np.abs(dev) > band[..., None]
+    outside = np.abs(f - final[..., None]) > band[..., None]
+    onset = started.argmax(axis=-1)
+    last = n - 1 - outside[..., ::-1].argmax(axis=-1)
+    settling = np.clip(_take(t, np.minimum(last + 1, n - 1)) - _take(t, onset), 0.0, None)
+    settling = np.where(outside[..., -1], np.nan, settling)
+
+    event = np.abs(peak) >= MIN_EVENT_HZ
+    return nadir, rocof, np.where(event, settling, np.nan), np.where(event, onset, -1)
+
+
+def recovery_segment(t, f, onset, n_samples=PENCIL_SAMPLES):
+    """扰动起点到结束的频率偏差（相对终值），线性插值到 n_samples 个等间隔点，返回 (y, dt)"""
+    tu = np.linspace(t[onset], t[-1], n_samples)
+    y = np.interp(tu, t, f - _edge_median(f, head=False))
+    return y, tu[1] - tu[0]
+
+
+def matrix_pencil(y, dt, order=PENCIL_ORDER):
+    """
+    矩阵束法模态拟合：y 为 (运行数, 点数) 的等长批次，dt 为 (运行数,) 采样间隔
+    Hankel 矩阵的 SVD、束矩阵特征值与留数最小二乘全部按批堆叠计算
+    返回 (连续域极点 s, 留数) ，形状均为 (运行数, order)
+    """
+    y = np.atleast_2d(y)
+    n = y.shape[-1]
+    scale = np.abs(y).max(axis=-1, keepdims=True)
+    y = y / np.where(scale > 0, scale, 1.0)
+    pencil = n // 3
+    hankel = sliding_window_view(y, pencil + 1, axis=-1)
+    _, _, vh = np.linalg.svd(hankel, full_matrices=False)
+    v = vh[..., :order, :].swapaxes(-1, -2)
+    z = np.linalg.eigvals(np.linalg.pinv(v[..., :-1, :]) @ v[..., 1:, :])
+    vandermonde = z[..., None, :] ** np.arange(n)[:, None]
+    residues = (np.linalg.pinv(vandermonde) @ y[..., None].astype(complex))[..., 0] * scale
+    s = np.log(z) / np.asarray(dt, dtype=float).reshape(-1, 1)
+    return s, residues
+
+
+def damping_ratio(y, dt):
+    """主导振荡模态（留数最大的共轭极点）的阻尼比 ζ = -σ/|s|；没有振荡模态时记为 1（过阻尼）"""
+    s, residues = matrix_pencil(y, dt)
+    # 接近奈奎斯特频率的极点是噪声拟合出来的，不参与评估
+    nyquist = np.pi / np.asarray(dt, dtype=float).reshape(-1, 1)
+    oscillatory = (np.abs(s.imag) >= 2 * np.pi * MIN_OSC_HZ) & (np.abs(s.imag) < 0.5 * nyquist)
+    weight = np.where(oscillatory, np.abs(residues), -1.0)
+    dominant = np.take_along_axis(s, weight.argmax(axis=-1)[:, None], axis=-1)[:, 0]
+    zeta = np.clip(-dominant.real / np.maximum(np.abs(dominant), 1e-12), -1.0, 1.0)
+    return np.where(oscillatory.any(axis=-1), zeta, 1.0)
+
+
+# =========================================================
+# 2. 单文件分析与批量调度
+# =========================================================
+def load_run(path):
+    """读取导入后的 Parquet（只读 时间/电压/频率 三列），按时间排序并去掉含 NaN 的行"""
+    table = pq.read_table(path, columns=["时间", "电压", "频率"])
+    t, v, f = (table.column(c).to_numpy().astype(np.float64) for c in ("时间", "电压", "频率"))
+    keep = np.isfinite(t) & np.isfinite(v) & np.isfinite(f)
+    t, v, f = t[keep], v[keep], f[keep]
+    order = np.argsort(t, kind="stable")
+    return t[order], v[order], f[order]
+
+
+def run_id(path):
+    """运行标识：导入时以内容哈希命名的 Parquet 文件名（不含扩展名）"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def analyze_chunk(paths):
+    """
+    分析一组文件（进程池任务）：采样点数与采样间隔相同的运行合成一批，标量指标每批只调用一次向量化内核；
+    各运行的恢复段再重采样成等长，整组一次做矩阵束拟合
+    返回与 paths 等长的结果列表，读取或计算失败的文件记为 {"run", "error"}
+    """
+    results = [None] * len(paths)
+    groups = {}
+    for i, path in enumerate(paths):
+        try:
+            t, v, f = load_run(path)
+            if len(t) < 8:
+                raise ValueError(f"有效数据点过少（{len(t)} 行）")
+            groups.setdefault((len(t), round(float(np.median(np.diff(t))), 12)), []).append((i, t, v, f))
+        except Exception as e:
+            results[i] = {"run": run_id(paths[i]), "error": f"{type(e).__name__}: {e}"}
+
+    segments, dts, owners = [], [], []
+    for members in groups.values():
+        index = [m[0] for m in members]
+        t, v, f = (np.vstack([m[k] for m in members]) for k in (1, 2, 3))
+        try:
+            depth, duration = sag_metrics(t, v)
+            nadir, rocof, settling, onset = frequency_metrics(t, f)
+        except Exception as e:
+            for i in index:
+                results[i] = {"run": run_id(paths[i]), "error": f"{type(e).__name__}: {e}"}
+            continue
+        n = t.shape[1]
+        for j, i in enumerate(index):
+            results[i] = {"run": run_id(paths[i]), "rows": n, "sag_depth": float(depth[j]), "sag_duration": float(duration[j]),
+                          "nadir": float(nadir[j]), "rocof": float(rocof[j]), "settling_time": float(settling[j]),
+                          "event": bool(onset[j] >= 0), "damping": float("nan")}
+            if onset[j] >= 0 and n - onset[j] >= 16:
+                y, dt = recovery_segment(t[j], f[j], int(onset[j]))
+                segments.append(y)
+                dts.append(dt)
+                owners.append(i)
+    if segments:
+        for i, zeta in zip(owners, damping_ratio(np.vstack(segments), np.array(dts))):
+            results[i]["damping"] = float(zeta)
+    return results
+
+
+class RunAnalytics:
+    """
+    仿真运行后处理：以 Parquet 文件名（即导入时的内容哈希）为键缓存结果（含失败记录），
+    每个结果一个 JSON 文件并在内存中保留一份；未缓存的文件较多时分块交给进程池并行计算
+    """
+
+    def __init__(self, directory=ANALYTICS_DIR, workers=None):
+        self.directory = directory
+        self.workers = workers or max(1, min(8, (os.cpu_count() or 2) - 1))
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _cached(self, key):
+        with self._lock:
+            result = self._memo.get(key)
+        if result is not None:
+            return result
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if payload.get("version") != ANALYTICS_VERSION:
+            return None
+        with self._lock:
+            self._memo[key] = payload["result"]
+        return payload["result"]
+
+    def _store(self, result):
+        # 失败结果同样缓存：文件名即内容哈希，同一文件再分析也只会失败，不必每次重跑都重读
+        with self._lock:
+            self._memo[result["run"]] = result
+        # 先写临时文件再原子替换，读者不会看到半写入的文件
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self._path(result["run"]) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": ANALYTICS_VERSION, "result": result}, f, ensure_ascii=False)
+        os.replace(tmp, self._path(result["run"]))
+
+    def analyze(self, paths):
+        """返回与 paths 顺序一致的结果列表，只计算尚未缓存的文件"""
+        results = {path: self._cached(run_id(path)) for path in paths}
+        todo = [path for path, result in results.items() if result is None]
+        chunks = [todo[i:i + CHUNK_RUNS] for i in range(0, len(todo), CHUNK_RUNS)]
+        if len(todo) < PARALLEL_MIN or self.workers == 1:
+            done = ((chunk, analyze_chunk(chunk)) for chunk in chunks)
+        else:
+            done = self._parallel(chunks)
+        for chunk, chunk_results in done:
+            for path, result in zip(chunk, chunk_results):
+                self._store(result)
+                results[path] = result
+        return [results[path] for path in paths]
+
+    def _parallel(self, chunks):
+        # 与 build_rag 一致用 spawn 启动子进程，避免 fork 已加载的模型线程状态
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(chunks)), mp_context=ctx) as pool:
+            futures = {pool.submit(analyze_chunk, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def analyze_dir(self, directory=INGEST_DIR):
+        """分析目录下所有已导入的运行（按修改时间排序，最新的在最后）"""
+        if not os.path.isdir(directory):
+            return []
+        paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".parquet")]
+        return self.analyze(sorted(paths, key=os.path.getmtime))
+
+
+def summarize(results):
+    """
+    各指标在所有成功分析的运行上的均值（忽略 NaN），外加运行数；
+    恢复耗时只平均已恢复的运行，有扰动但结束时仍未恢复的运行单独计数
+    """
+    ok = [r for r in results if "error" not in r]
+    summary = {"runs": len(ok), "failed": len(results) - len(ok),
+               "unrecovered": sum(r["event"] and not np.isfinite(r["settling_time"]) for r in ok)}
+    for key in METRIC_LABELS:
+        values = np.array([r[key] for r in ok], dtype=float)
+        summary[key] = float(np.nanmean(values)) if np.isfinite(values).any() else float("nan")
+    return summary
+
+
+def damping_grade(zeta):
+    """阻尼比评价：工程上 0.6~0.8 左右为理想欠阻尼响应"""
+    if not np.isfinite(zeta):
+        return "无扰动"
+    if zeta >= 0.6:
+        return "优"
+    if zeta >= 0.3:
+        return "良"
+    if zeta >= 0.1:
+        return "一般"
+    return "差"
+
+
+if __name__ == "__main__":
+    # 用法：python -m utils.run_analytics [目录]   分析目录下全部已导入的运行（不读写缓存）并输出吞吐
+    directory = sys.argv[1] if len(sys.argv) > 1 else INGEST_DIR
+    scratch = tempfile.mkdtemp(prefix="run_analytics_")
+    try:
+        t = time.perf_counter()
+        results = RunAnalytics(directory=scratch).analyze_dir(directory)
+        elapsed = time.perf_counter() - t
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    summary = summarize(results)
+    print(f"{summary['runs']} 个运行（失败 {summary['failed']}，未恢复 {summary['unrecovered']}），用时 {elapsed:.2f} s")
+    for key, label in METRIC_LABELS.items():
+        print(f"  {label}: {summary[key]:.4g}")
@@ -0,0 +1,160 @@
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+SPARSE_DIR_NAME = "bm25"
+MAX_TERM_BYTES = 32
+RRF_K = 60
+
+_ASCII = re.compile(r"[a-z]+|\d+(?:\.\d+)?")
+_CJK_RUN = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]+")
+
+
+def default_tokenizer():
+    """有 jieba 时用搜索引擎模式分词，否则退化为中文二元组（bigram）"""
+    try:
+        import jieba  # noqa: F401
+        return "jieba"
+    except ImportError:
+        return "bigram"
+
+
+def tokenize(text, mode="bigram"):
+    """
+    中英混合分词：英文字母串与数字分开并转小写（"±500kV" -> ["500", "kv"]，"VSG" -> ["vsg"]），
+    中文连续片段按 mode 切分：jieba 搜索模式，或相邻两字一组
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = _ASCII.findall(text)
+    runs = _CJK_RUN.findall(text)
+    if mode == "jieba":
+        import jieba
+        for run in runs:
+            tokens.extend(w for w in jieba.lcut_for_search(run) if w.strip())
+    else:
+        for run in runs:
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _encode_term(term):
+    return term.encode("utf-8")[:MAX_TERM_BYTES]
+
+
+def build_sparse_index(ids, texts, out_dir, mode=None, k1=1.5, b=0.75):
+    """
+    构建 BM25 倒排索引，全部以定长 .npy 存储，查询时内存映射：
+      terms.npy      词项（utf-8 定长字节串，已排序，二分查找定位词项号）
+      offsets.npy    int64，词项 t 的倒排表为 [offsets[t], offsets[t+1])
+      postings.npy   int32 文档号；tf.npy uint16 词频
+      doc_len.npy    float32 文档长度；ids.npy 文档号 -> 知识块 id
+    """
+    mode = mode or default_tokenizer()
+    vocab = {}
+    term_col, doc_col, tf_col = [], [], []
+    doc_len = np.zeros(len(texts), dtype=np.float32)
+    for d, text in enumerate(texts):
+        tokens = [_encode_term(t) for t in tokenize(text, mode)]
+        doc_len[d] = len(tokens)
+        for term, count in Counter(tokens).items():
+            term_col.append(vocab.setdefault(term, len(vocab)))
+            doc_col.append(d)
+            tf_col.append(min(count, np.iinfo(np.uint16).max))
+
+    terms = sorted(vocab)
+    rank = np.empty(len(vocab), dtype=np.int64)
+    rank[[vocab[t] for t in terms]] = np.arange(len(terms))
+    term_col = rank[np.asarray(term_col, dtype=np.int64)]
+    order = np.argsort(term_col, kind="stable")   # 先按词项、同词项内按文档号
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_col, minlength=len(terms)), out=offsets[1:])
+
+    os.makedirs(out_dir, exist_ok=True)
+    arrays = {
+        "terms": np.array(terms, dtype=f"S{MAX_TERM_BYTES}"),
+        "offsets": offsets,
+        "postings": np.asarray(doc_col, dtype=np.int32)[order],
+        "tf": np.asarray(tf_col, dtype=np.uint16)[order],
+        "doc_len": doc_len,
+        "ids": np.array([i.encode("utf-8") for i in ids], dtype="S"),
+    }
+    for name, arr in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), arr)
+    meta = {"tokenizer": mode, "k1": k1, "b": b, "n_docs": len(texts),
+            "avgdl": float(doc_len.mean()) if len(texts) else 0.0}
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+class SparseIndex:
+    """内存映射的 BM25 索引：查询只读取命中词项的倒排表，常驻内存只有 meta"""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.mode = self.meta["tokenizer"]
+        if self.mode == "jieba" and default_tokenizer() != "jieba":
+            raise RuntimeError("稀疏索引使用 jieba 分词构建，但当前环境未安装 jieba")
+        load = lambda name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+        self.terms, self.offsets = load("terms"), load("offsets")
+        self.postings, self.tf = load("postings"), load("tf")
+        self.doc_len, self.ids = load("doc_len"), load("ids")
+
+    @classmethod
+    def open(cls, index_dir):
+        """索引目录下没有稀疏索引（旧版索引）或无法使用时返回 None"""
+        directory = os.path.join(index_dir, SPARSE_DIR_NAME)
+        if not os.path.exists(os.path.join(directory, "meta.json")):
+            return None
+        try:
+            return cls(directory)
+        except Exception as e:
+            print(f"稀疏索引不可用，仅使用向量检索: {e}")
+            return None
+
+    def _term_id(self, term):
+        key = _encode_term(term)
+        i = int(np.searchsorted(self.terms, key))
+        return i if i < len(self.terms) and self.terms[i] == key else None
+
+    def search(self, query, k=10):
+        """返回 [(知识块 id, BM25 分数)]，按分数降序"""
+        n, avgdl = self.meta["n_docs"], self.meta["avgdl"] or 1.0
+        k1, b = self.meta["k1"], self.meta["b"]
+        docs, scores = [], []
+        for term in set(tokenize(query, self.mode)):
+            t = self._term_id(term)
+            if t is None:
+                continue
+            lo, hi = int(self.offsets[t]), int(self.offsets[t + 1])
+            d = np.asarray(self.postings[lo:hi])
+            tf = self.tf[lo:hi].astype(np.float32)
+            df = hi - lo
+            idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            norm = k1 * (1.0 - b + b * self.doc_len[d] / avgdl)
+            docs.append(d)
+            scores.append(idf * tf * (k1 + 1.0) / (tf + norm))
+        if not docs:
+            return []
+        uniq, inverse = np.unique(np.concatenate(docs), return_inverse=True)
+        total = np.bincount(inverse, weights=np.concatenate(scores))
+        top = np.argsort(-total)[:k] if len(total) <= k else np.argpartition(-total, k)[:k]
+        top = top[np.argsort(-total[top])]
+        return [(self.ids[uniq[i]].decode("utf-8"), float(total[i])) for i in top]
+
+
+def rrf_fuse(*rankings, k=RRF_K):
+    """Reciprocal Rank Fusion：score(id) = Σ 1 / (k + 名次)，返回按融合分数降序的 id 列表"""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
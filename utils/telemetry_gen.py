@@ -0,0 +1,151 @@
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.signal import lfilter
+from scipy.special import ndtr
+
+F_NOMINAL = 50.0
+
+# 风电场默认参数
+DEFAULT_FARM = {
+    "rated_mw": 10.0,          # 单机额定功率
+    "weibull_k": 2.0,          # 风速 Weibull 形状参数
+    "weibull_scale": 10.0,     # 风速 Weibull 尺度参数 m/s（平均风速约 8.9 m/s）
+    "tau": 60.0,               # 风速自相关时间常数 s
+    "spatial_corr": 0.8,       # 机组间风速相关系数（共同分量所占方差比例）
+    "cut_in": 3.0,
+    "rated_speed": 12.0,
+    "cut_out": 25.0,
+    "u_dc_kv": 500.0,          # 直流母线额定电压
+    "dc_droop": 0.02,          # 直流电压随出力偏离的下垂（pu / pu）
+    "freq_droop": 0.05,        # 频率随出力偏离半载的偏移（Hz / pu）
+    "freq_tau": 5.0,           # 频率慢变分量时间常数 s
+}
+
+
+@dataclass
+class FaultEvent:
+    """
+    注入的故障事件
+    kind: trip 机组脱网 / dc_sag 直流电压跌落 / freq_dip 频率跌落 / gust 阵风
+    turbines: 受影响的机组下标（None 为全部）；magnitude: trip 忽略，dc_sag / freq_dip 为 pu / Hz，gust 为 m/s
+    """
+    kind: str
+    start: float
+    duration: float
+    magnitude: float = 0.0
+    turbines: object = None
+
+
+def power_curve(wind, rated_mw=10.0, cut_in=3.0, rated_speed=12.0, cut_out=25.0):
+    """典型变速风机功率曲线：切入到额定之间按风速三次方增长，额定到切出之间满发，其余为 0"""
+    wind = np.asarray(wind)
+    ramp = np.clip((wind ** 3 - cut_in ** 3) / (rated_speed ** 3 - cut_in ** 3), 0.0, 1.0)
+    return np.where(wind < cut_out, ramp, 0.0) * rated_mw
+
+
+class TelemetryGenerator:
+    """
+    N 台风机的合成遥测：风速、有功、直流电压、频率，全部按 (机组, 时间) 数组向量化生成
+    风速为高斯 AR(1) 过程（场内共同分量 + 机组独立分量）经高斯 copula 变换到 Weibull 分布，
+    时间方向的递推由 lfilter 在 C 层完成，跨块保存滤波器状态，分块输出在块边界处连续。
+    """
+
+    def __init__(self, n_turbines, fs=1.0, seed=None, events=(), dtype=np.float64, **farm):
+        unknown = set(farm) - set(DEFAULT_FARM)
+        if unknown:
+            raise KeyError(f"未知风电场参数: {sorted(unknown)}")
+        self.n = int(n_turbines)
+        self.fs = float(fs)
+        self.params = {**DEFAULT_FARM, **farm}
+        self.events = list(events)
+        self.dtype = dtype
+        self.samples = 0
+        self._rng = np.random.default_rng(seed)
+
+        p = self.params
+        self._phi = np.exp(-1.0 / (p["tau"] * self.fs))
+        self._phi_f = np.exp(-1.0 / (p["freq_tau"] * self.fs))
+        # lfilter 的跨块状态（= φ · 上一点）；风速从平稳分布 N(0, 1) 起步，频率从额定值起步
+        self._z_common = self._phi * self._rng.standard_normal((1, 1))
+        self._z_own = self._phi * self._rng.standard_normal((self.n, 1))
+        self._f_state = np.zeros(1)
+
+    def add_event(self, event):
+        self.events.append(event)
+
+    def _ar1(self, state, shape):
+        """单位方差 AR(1)：z[t] = φ z[t-1] + sqrt(1-φ²) e[t]，返回 (序列, 新的滤波器状态)"""
+        e = self._rng.standard_normal(shape) * np.sqrt(1 - self._phi ** 2)
+        return lfilter([1.0], [1.0, -self._phi], e, axis=-1, zi=state)
+
+    @staticmethod
+    def _apply_events(events, t, wind, power, u_dc, freq):
+        for ev in events:
+            active = (t >= ev.start) & (t < ev.start + ev.duration)
+            if not active.any():
+                continue
+            cells = (slice(None), active) if ev.turbines is None else np.ix_(np.asarray(ev.turbines), active)
+            if ev.kind == "gust":
+                # 升余弦阵风：持续期间平滑升到峰值再回落
+                shape = 0.5 * (1 - np.cos(2 * np.pi * (t[active] - ev.start) / ev.duration))
+                wind[cells] += ev.magnitude * shape
+            elif ev.kind == "trip":
+                power[cells] = 0.0
+            elif ev.kind == "dc_sag":
+                u_dc[cells] *= 1.0 - ev.magnitude
+            elif ev.kind == "freq_dip":
+                freq[cells] -= ev.magnitude
+            else:
+                raise ValueError(f"未知故障类型: {ev.kind}")
+
+    def chunk(self, k):
+        """生成接下来 k 个采样点：返回 {"t": (k,), "wind"/"power"/"u_dc"/"freq": (N, k)}"""
+        p = self.params
+        t = (self.samples + np.arange(k)) / self.fs
+        rho = p["spatial_corr"]
+        z_common, self._z_common = self._ar1(self._z_common, (1, k))
+        z_own, self._z_own = self._ar1(self._z_own, (self.n, k))
+        z = np.sqrt(rho) * z_common + np.sqrt(1 - rho) * z_own
+        # 高斯 copula：Φ(z) ~ U(0,1)，再按 Weibull 分位函数变换
+        u = np.clip(ndtr(z), 1e-12, 1 - 1e-12)
+        wind = p["weibull_scale"] * (-np.log1p(-u)) ** (1.0 / p["weibull_k"])
+
+        # 阵风先改变风速再经功率曲线得到出力，其余事件直接作用在各量上
+        events = [ev for ev in self.events if ev.start < t[-1] + 1 / self.fs and ev.start + ev.duration > t[0]]
+        self._apply_events([ev for ev in events if ev.kind == "gust"], t, wind, None, None, None)
+        power = power_curve(wind, p["rated_mw"], p["cut_in"], p["rated_speed"], p["cut_out"])
+
+        # 直流电压随场站出力偏离半载而下垂；频率为慢变 AR 分量加出力偏移；各量叠加测量噪声
+        load = power.mean(axis=0) / p["rated_mw"]
+        u_dc = p["u_dc_kv"] * (1 - p["dc_droop"] * (load - 0.5)) + 0.3 * self._rng.standard_normal((self.n, k))
+        e = 0.01 * self._rng.standard_normal(k)
+        f_slow, self._f_state = lfilter([1 - self._phi_f], [1.0, -self._phi_f], e, zi=self._f_state)
+        freq = F_NOMINAL + f_slow + p["freq_droop"] * (load - 0.5) + 0.002 * self._rng.standard_normal((self.n, k))
+        self._apply_events([ev for ev in events if ev.kind != "gust"], t, wind, power, u_dc, freq)
+
+        self.samples += k
+        return {"t": t, "wind": wind.astype(self.dtype, copy=False), "power": power.astype(self.dtype, copy=False),
+                "u_dc": u_dc.astype(self.dtype, copy=False), "freq": freq.astype(self.dtype, copy=False)}
+
+    def stream(self, duration=None, chunk_seconds=1.0):
+        """按块持续生成，duration 为 None 时无限生成"""
+        k = max(1, int(round(chunk_seconds * self.fs)))
+        end = None if duration is None else self.samples + int(round(duration * self.fs))
+        while end is None or self.samples < end:
+            yield self.chunk(k if end is None else min(k, end - self.samples))
+
+
+if __name__ == "__main__":
+    # 用法：python -m utils.telemetry_gen [机组数] [采样率 Hz] [时长 s]   输出生成吞吐
+    n, fs, duration = (int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+                       float(sys.argv[2]) if len(sys.argv) > 2 else 100.0,
+                       float(sys.argv[3]) if len(sys.argv) > 3 else 60.0)
+    gen = TelemetryGenerator(n, fs=fs, seed=0, events=[FaultEvent("trip", duration / 2, 1.0, turbines=range(10))])
+    t = time.perf_counter()
+    points = sum(c["wind"].size for c in gen.stream(duration))
+    elapsed = time.perf_counter() - t
+    print(f"{n} 台 × {fs:.0f} Hz × {duration:.0f} s：{points} 点，用时 {elapsed:.2f} s，"
+          f"{points / elapsed / 1e6:.1f} M 点/s（{duration / elapsed:.0f} 倍实时）")
@@ -0,0 +1,118 @@
+import atexit
+import threading
+import time
+
+import numpy as np
+import streamlit as st
+
+from utils.archive import Archive, ArchiveWriter
+from utils.ring_buffer import RingBuffer
+
+# 拓扑大屏使用的遥测通道
+TOPOLOGY_CHANNELS = ["Wind_Speed", "Power_Total", "U_DC"]
+
+
+class TelemetryStore:
+    """
+    进程级共享遥测存储
+    由一个后台线程作为唯一生产者写入环形缓冲区，所有浏览器会话只按序号读取快照，
+    因此内存与 CPU 不随在线人数增长，且各会话看到的数据完全一致。
+    """
+
+    def __init__(self, channels, source, capacity=3600, interval=1.0, archive=None):
+        self.channels = list(channels)
+        self.interval = interval
+        self.archive = archive  # 可选 ArchiveWriter，样本同时落盘归档
+        self._source = source
+        self._buffer = RingBuffer(self.channels, capacity)
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def seq(self):
+        """最新样本序号（累计写入点数），0 表示尚无数据"""
+        return self._buffer.count
+
+    def publish(self, values):
+        """写入一个采样点并唤醒等待中的读者"""
+        with self._cond:
+            self._buffer.append(values)
+            self._cond.notify_all()
+        if self.archive is not None:
+            if not isinstance(values, dict):
+                values = dict(zip(self.channels, values))
+            self.archive.append(time.time(), values)
+
+    def prefill(self, values, n):
+        """用常数基线预填充历史，保证曲线一开始就有完整窗口"""
+        with self._cond:
+            self._buffer.fill(values, n)
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.publish(self._source(self.seq))
+            except Exception as e:
+                print(f"遥测生产者异常: {e}")
+            next_tick += self.interval
+            self._stop.wait(max(0.0, next_tick - time.monotonic()))
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="telemetry-producer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self.archive is not None:
+            self.archive.flush()
+
+    def wait_for(self, seq, timeout=None):
+        """阻塞直到序号超过 seq，返回最新序号"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._buffer.count > seq, timeout=timeout)
+            return self._buffer.count
+
+    def snapshot(self, n=None):
+        """
+        读取一致性快照：{"seq": 序号, "latest": {通道: 最新值}, "window": {通道: 最近 n 点}}
+        窗口数据在锁内拷贝，读者拿到后不受生产者后续写入影响
+        """
+        with self._cond:
+            if len(self._buffer) == 0:
+                return {"seq": 0, "latest": {}, "window": {}}
+            block = self._buffer.window(n=n).copy()
+            seq = self._buffer.count
+        return {
+            "seq": seq,
+            "latest": {name: block[i, -1].item() for i, name in enumerate(self.channels)},
+            "window": {name: block[i] for i, name in enumerate(self.channels)},
+        }
+
+
+def make_topology_demo_source(points=24):
+    """演示数据源：24 点风速正弦循环播放，功率按风速折算，直流电压小幅随机波动"""
+    x = np.linspace(0, 4 * np.pi, points)
+    wind_wave = 10 + 8 * np.sin(x)
+    power_wave = wind_wave * 200
+
+    def source(seq):
+        idx = (seq + 1) % points
+        return (wind_wave[idx], power_wave[idx], round(500.0 + np.random.uniform(-0.5, 0.5), 1))
+
+    return source
+
+
+@st.cache_resource
+def get_topology_store():
+    """全进程共享的拓扑大屏遥测存储（首次调用时启动后台生产线程）"""
+    archive = ArchiveWriter(Archive(), segment_size=3600, max_age=300.0)
+    store = TelemetryStore(TOPOLOGY_CHANNELS, make_topology_demo_source(), capacity=3600, interval=1.0, archive=archive)
+    store.prefill({"Wind_Speed": 10.0, "Power_Total": 2000.0, "U_DC": 500.0}, 20)
+    # 进程正常退出时把未满一段的缓冲写盘
+    atexit.register(store.stop)
+    return store.start()
@@ -0,0 +1,120 @@
+import math
+import time
+
+import numpy as np
+
+# 检索索引类型：flat 为精确检索；其余为近似检索，需在构建时训练
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+SEARCH_INDEX_NAME = "search.faiss"
+
+# 查询参数默认值（写入清单，加载时套用）
+DEFAULT_SEARCH_PARAMS = {"flat": {}, "ivf_flat": {"nprobe": 16}, "ivf_pq": {"nprobe": 32}, "hnsw": {"efSearch": 64}}
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+PQ_NBITS = 8
+MAX_TRAIN_POINTS = 100_000
+
+
+def _nlist(n):
+    """IVF 聚类中心数：约 4·√n，且每个中心至少有 39 个训练点（faiss 的建议下限）"""
+    return int(max(1, min(4 * math.sqrt(n), n // 39)))
+
+
+def _pq_m(dim):
+    """PQ 子空间数：取能整除维度、且每个子向量不少于 8 维的最大值"""
+    for m in (64, 48, 32, 24, 16, 8, 4, 2, 1):
+        if dim % m == 0 and dim // m >= 8:
+            return m
+    return 1
+
+
+def build_search_index(vectors, kind="flat", seed=0):
+    """
+    由全部向量构建检索索引，向量顺序即索引位置（与 index_to_docstore_id 一一对应）
+    IVF 类索引用最多 MAX_TRAIN_POINTS 个随机样本训练，并建立 direct map 以支持 MMR 取回向量
+    """
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    if kind == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif kind in ("ivf_flat", "ivf_pq"):
+        quantizer = faiss.IndexFlatL2(dim)
+        nlist = _nlist(n)
+        if kind == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_m(dim), PQ_NBITS)
+        rng = np.random.default_rng(seed)
+        sample = vectors if n <= MAX_TRAIN_POINTS else vectors[rng.choice(n, MAX_TRAIN_POINTS, replace=False)]
+        if kind == "ivf_pq" and len(sample) < 2 ** PQ_NBITS * 39:
+            raise ValueError(f"IVF-PQ 至少需要 {2 ** PQ_NBITS * 39} 个向量用于训练，当前只有 {len(sample)} 个")
+        index.train(sample)
+    else:
+        raise ValueError(f"未知索引类型: {kind}（可选: {', '.join(INDEX_TYPES)}）")
+    index.add(vectors)
+    if kind.startswith("ivf"):
+        index.make_direct_map()
+    return index
+
+
+def apply_search_params(index, params):
+    """套用 nprobe / efSearch 等查询参数"""
+    import faiss
+
+    space = faiss.ParameterSpace()
+    for name, value in (params or {}).items():
+        space.set_index_parameter(index, name, value)
+    return index
+
+
+def read_search_index(path, params=None):
+    """以内存映射方式只读打开索引文件（不把向量整体读进内存）"""
+    import faiss
+
+    index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    return apply_search_params(index, params)
+
+
+def benchmark(vectors, kinds=INDEX_TYPES, k=10, n_queries=200, seed=0):
+    """
+    召回率 / 延迟基准：以库内随机向量（加少量噪声）为查询，flat 精确检索结果为真值
+    返回 [{"kind", "build_s", "recall", "p50_ms", "p95_ms", "p99_ms", "bytes"}]
+    """
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False)]
+    queries = queries + rng.normal(0, queries.std() * 0.05, queries.shape).astype(np.float32)
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    rows = []
+    for kind in kinds:
+        t0 = time.perf_counter()
+        try:
+            index = apply_search_params(build_search_index(vectors, kind, seed), DEFAULT_SEARCH_PARAMS[kind])
+        except ValueError as e:
+            rows.append({"kind": kind, "error": str(e)})
+            continue
+        build_s = time.perf_counter() - t0
+        found = np.empty_like(truth)
+        lat = np.empty(len(queries))
+        for i, q in enumerate(queries):
+            t = time.perf_counter()
+            _, found[i:i + 1] = index.search(q[None, :], k)
+            lat[i] = time.perf_counter() - t
+        recall = np.mean([len(set(f) & set(g)) / k for f, g in zip(found, truth)])
+        rows.append({
+            "kind": kind, "build_s": build_s, "recall": float(recall),
+            "p50_ms": float(np.percentile(lat, 50) * 1e3), "p95_ms": float(np.percentile(lat, 95) * 1e3),
+            "p99_ms": float(np.percentile(lat, 99) * 1e3),
+            "bytes": int(faiss.serialize_index(index).nbytes),
+        })
+    return rows
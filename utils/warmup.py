@@ -0,0 +1,67 @@
+import importlib
+import threading
+import time
+
+# 预热时依次导入的重量级模块（越靠前的越常用）
+HEAVY_MODULES = [
+    "openai",
+    "faiss",
+    "langchain_community.vectorstores.faiss",        # langchain_community 的包级导入是惰性的，需指定具体子模块
+    "langchain_community.embeddings.huggingface",
+    "sentence_transformers",
+]
+
+
+class StartupReport:
+    """记录启动各阶段耗时：[(阶段, 秒, 状态)]，线程安全"""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.stages = []
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self, stage, fn, *args):
+        """执行并计时一个阶段，异常只记录不抛出"""
+        t = time.perf_counter()
+        try:
+            result = fn(*args)
+            status = "ok"
+        except Exception as e:
+            result = None
+            status = f"失败: {str(e)[:80]}"
+        with self._lock:
+            self.stages.append((stage, time.perf_counter() - t, status))
+        return result
+
+    def rows(self):
+        with self._lock:
+            return list(self.stages)
+
+    def format(self):
+        lines = [f"{'阶段':<48}{'耗时(s)':>10}  状态"]
+        for stage, seconds, status in self.rows():
+            lines.append(f"{stage:<48}{seconds:>10.2f}  {status}")
+        total = sum(s for _, s, _ in self.rows())
+        lines.append(f"{'合计':<48}{total:>10.2f}")
+        return "\n".join(lines)
+
+
+def warm_up(report, steps=()):
+    """
+    后台预热：先逐个导入重量级模块（每项耗时为增量，已被前项带入的依赖不重复计），
+    再依次执行 steps 中的 (阶段名, 可调用对象)，例如加载嵌入模型与索引
+    """
+    for name in HEAVY_MODULES:
+        report.run(f"import {name}", importlib.import_module, name)
+    for stage, fn in steps:
+        report.run(stage, fn)
+    report.done.set()
+    print("启动预热完成：\n" + report.format())
+
+
+def start_warm_up(steps=()):
+    """在守护线程中预热，立即返回 StartupReport（页面渲染不等待）"""
+    report = StartupReport()
+    threading.Thread(target=warm_up, args=(report, steps), name="ai-warm-up", daemon=True).start()
+    return report